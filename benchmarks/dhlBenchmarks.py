@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""Reproducible, headless benchmarks of the quoting pipeline and workbook loading
+
+    python benchmarks/dhlBenchmarks.py --output before.json
+    python benchmarks/dhlBenchmarks.py --output after.json --compare before.json
+
+The Application runs against benchmarks/tkStub.py unless --real-tk is given (e.g. under xvfb-run), so no display is
+needed. Every benchmark reports the median and minimum time per operation over several repeats.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPEAT = 7
+WEIGHTS = 1000    # weights quoted per operation of the adjust / buffer / generate_cost benchmarks
+WORKBOOK_SIZES = (0, 2000, 10000, 50000)    # extra filler rows in the synthetic workbooks
+COST_RANGES = {    # generate_cost benchmark name: range of buffered weights it quotes
+    'generate_cost_table': (0.5, 70),
+    'generate_cost_band_70_150': (70.5, 150),
+    'generate_cost_band_150_300': (150.5, 300),
+    'generate_cost_band_300_999': (300.5, 999),
+    'generate_cost_band_999_plus': (999.5, 20000)
+}
+
+
+def measure(fn, number = 1, repeat = REPEAT, setup = None):
+    """Time fn, returns the per call median and minimum in microseconds"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {'median_us': statistics.median(times) * 1e6, 'min_us': min(times) * 1e6, 'number': number,
+            'repeat': repeat}
+
+
+def half_kg_weights(low, high, count, rng):
+    """Return count rounded and buffered looking weights between low and high"""
+    return [rng.randint(int(low * 2), int(high * 2)) / 2 for _ in range(count)]
+
+
+def bench_pipeline(results, rng):
+    """Benchmark the individual stages of a quote"""
+    import dhlQuoteEngine
+    import dhlRateCache
+
+    rateTable = dhlRateCache.load_rate_table()
+    raw = [rng.uniform(0, 3000) for _ in range(WEIGHTS)]
+    adjusted = [dhlQuoteEngine.adjust_weight(w) for w in raw]
+
+    results['adjust'] = measure(lambda: [dhlQuoteEngine.adjust_weight(w) for w in raw], 20)
+    results['buffer'] = measure(lambda: [dhlQuoteEngine.buffer_weight(w) for w in adjusted], 20)
+    col = dhlQuoteEngine.country_column('China')
+    for name, (low, high) in COST_RANGES.items():
+        weights = half_kg_weights(low, high, WEIGHTS, rng)
+        results[name] = measure(lambda: [rateTable.cost(w, col) for w in weights], 20)
+
+
+def bench_application(results, rng):
+    """Benchmark initialize_rates and generate_report through the Application class"""
+    import dhlFreightCalculator
+    import dhlRateCache
+
+    app = dhlFreightCalculator.Application(master = dhlFreightCalculator.tk.Tk())
+
+    def initialize():
+        app.initialize_rates()
+        app.rateLoader.join()
+
+    cacheDir = dhlRateCache.cache_dir()
+    results['initialize_rates_cold'] = measure(initialize, setup = lambda: shutil.rmtree(cacheDir, True))
+    results['initialize_rates_snapshot'] = measure(initialize, 20)
+    app.rateTable = app.loadedRates
+
+    app.method = 'Per Piece'
+    app.pieceWeight.set('250')
+    for var, qty in zip((app.qty1, app.qty2, app.qty3, app.qty4, app.qty5), (10, 100, 500, 1000, 5000)):
+        var.set(str(qty))
+    results['generate_report_per_piece'] = measure(app.generate_report, 200)
+
+    app.method = 'Entire Shipment'
+    grossWeights = [str(rng.uniform(0, 3000)) for _ in range(200)]
+    iterator = iter(grossWeights * REPEAT)
+
+    def shipment():
+        app.grossWeight.set(next(iterator))
+        app.generate_report()
+
+    results['generate_report_entire_shipment'] = measure(shipment, 200)
+
+
+def bench_workbooks(results, workDir, sizes):
+    """Benchmark parsing and snapshot loading of synthetic workbooks of growing size"""
+    import dhlQuoteEngine
+    import dhlRateCache
+    from syntheticWorkbook import make_workbook
+
+    for extraRows in sizes:
+        path = make_workbook(os.path.join(workDir, 'rates_{}.xlsx'.format(extraRows)), extraRows)
+        size = os.path.getsize(path)
+        parse = measure(lambda: dhlQuoteEngine.load_rate_table(path), repeat = 3)
+        dhlRateCache.load_rate_table(path)
+        snapshot = measure(lambda: dhlRateCache.load_rate_table(path), 20)
+        for name, result in (('parse', parse), ('snapshot', snapshot)):
+            result['workbook_bytes'] = size
+            result['extra_rows'] = extraRows
+            results['workbook_{}_{}_rows'.format(name, extraRows)] = result
+
+
+def compare(results, baselinePath):
+    """Print each benchmark against a previous JSON run"""
+    with open(baselinePath) as fh:
+        baseline = json.load(fh)['results']
+    print('\n{:<40}{:>14}{:>14}{:>9}'.format('benchmark', 'before us', 'after us', 'ratio'))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['median_us'], result['median_us']
+        ratio = after / before if before else float('inf')
+        flag = '  slower' if ratio > 1.1 else ('  faster' if ratio < 0.9 else '')
+        print('{:<40}{:>14.1f}{:>14.1f}{:>8.2f}x{}'.format(name, before, after, ratio, flag))
+
+
+def main(argv = None):
+    """Run the benchmarks, print them and optionally write / compare JSON results"""
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help = 'write the results to this JSON file')
+    parser.add_argument('--compare', metavar = 'JSON', help = 'compare against the results of a previous run')
+    parser.add_argument('--real-tk', action = 'store_true', help = 'use the real tkinter, needs a (virtual) display')
+    parser.add_argument('--sizes', default = ','.join(str(s) for s in WORKBOOK_SIZES),
+                        help = 'comma separated extra filler rows for the synthetic workbook benchmarks')
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args(argv)
+
+    if not args.real_tk:
+        import tkStub
+        tkStub.install()
+
+    workDir = tempfile.mkdtemp(prefix = 'dhlbench')
+    os.environ['DHL_RATES_CACHE_DIR'] = os.path.join(workDir, 'cache')    # never touch the user's real snapshot
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        bench_pipeline(results, rng)
+        bench_application(results, rng)
+        bench_workbooks(results, workDir, [int(s) for s in args.sizes.split(',') if s.strip()])
+    finally:
+        shutil.rmtree(workDir, True)
+
+    print('{:<40}{:>14}{:>14}'.format('benchmark', 'median us', 'min us'))
+    for name, result in results.items():
+        print('{:<40}{:>14.1f}{:>14.1f}'.format(name, result['median_us'], result['min_us']))
+
+    if args.compare:
+        compare(results, args.compare)
+    if args.output:
+        meta = {'python': platform.python_version(), 'platform': platform.platform(), 'seed': args.seed,
+                'tk': 'real' if args.real_tk else 'stub', 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(args.output, 'w') as fh:
+            json.dump({'meta': meta, 'results': results}, fh, indent = 2)
+
+
+if __name__ == '__main__':
+    main()
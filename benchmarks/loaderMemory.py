@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""Peak memory and load time of the workbook loaders, before and after the streamed, range limited loader
+
+    python benchmarks/loaderMemory.py
+    python benchmarks/loaderMemory.py --sizes 0,10000,50000 --output loader.json
+
+Each load runs in a fresh process so its peak RSS is its own. 'full' is the original loader - the whole workbook in
+normal mode, images included, kept open for the life of the process - and 'streamed' is
+dhlQuoteEngine.load_rate_table. Peak RSS comes from /proc or getrusage, so this runs on Linux and macOS only.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOADERS = ('full', 'streamed')
+WORKBOOK_SIZES = (0, 10000, 50000)    # extra filler rows in the synthetic workbooks
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in KiB"""
+    try:
+        with open('/proc/self/status') as fh:    # Linux - unlike ru_maxrss, VmHWM is not inherited across exec
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024    # macOS reports bytes
+
+
+def child(loader, path):
+    """Load the rates once with one loader and print its timings and peak RSS as JSON"""
+    import warnings
+
+    import openpyxl
+
+    import dhlQuoteEngine
+
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    if loader == 'full':
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            wb = openpyxl.load_workbook(path, data_only = True)
+        rateTable = dhlQuoteEngine.RateTable.from_worksheet(wb[dhlQuoteEngine.RATES_SHEET])    # wb stays open
+    else:
+        rateTable = dhlQuoteEngine.load_rate_table(path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'load_ms': elapsed * 1000, 'baseline_kb': baseline, 'peak_kb': peak_rss_kb(),
+                      'columns': len(rateTable.columns())}))
+
+
+def run(loader, path):
+    """Run one load in a fresh interpreter, returns its result dict"""
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', loader, path], check = True,
+                         stdout = subprocess.PIPE, universal_newlines = True).stdout
+    result = json.loads(out)
+    result['load_peak_kb'] = result['peak_kb'] - result['baseline_kb']
+    return result
+
+
+def main(argv = None):
+    """Measure every loader on the real workbook and synthetic workbooks of growing size"""
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default = ','.join(str(s) for s in WORKBOOK_SIZES),
+                        help = 'comma separated extra filler rows for the synthetic workbooks')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'runs per loader, the fastest is reported')
+    parser.add_argument('--output', help = 'write the results to this JSON file')
+    parser.add_argument('--child', nargs = 2, metavar = ('LOADER', 'PATH'), help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child(*args.child)
+        return
+
+    import dhlQuoteEngine
+    from syntheticWorkbook import make_workbook
+
+    workDir = tempfile.mkdtemp(prefix = 'dhlloader')
+    results = {}
+    try:
+        workbooks = [('dhlRates.xlsx', dhlQuoteEngine.resource_path(dhlQuoteEngine.RATES_FILE))]
+        for extraRows in [int(s) for s in args.sizes.split(',') if s.strip()]:
+            path = make_workbook(os.path.join(workDir, 'rates_{}.xlsx'.format(extraRows)), extraRows)
+            workbooks.append(('synthetic +{} rows'.format(extraRows), path))
+        for name, path in workbooks:
+            for loader in LOADERS:
+                runs = [run(loader, path) for _ in range(args.repeat)]
+                result = min(runs, key = lambda r: r['load_ms'])
+                result['load_peak_kb'] = min(r['load_peak_kb'] for r in runs)
+                result['workbook_bytes'] = os.path.getsize(path)
+                results['{} / {}'.format(name, loader)] = result
+    finally:
+        shutil.rmtree(workDir, True)
+
+    print('{:<36}{:>12}{:>14}{:>14}'.format('workbook / loader', 'load ms', 'load peak KiB', 'peak RSS KiB'))
+    for name, result in results.items():
+        print('{:<36}{:>12.1f}{:>14,}{:>14,}'.format(name, result['load_ms'], result['load_peak_kb'],
+                                                       result['peak_kb']))
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent = 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Generates DHL rate workbooks with the 'US Import Rates' layout, padded out to any size for benchmarking"""
+import argparse
+import random
+
+import openpyxl
+
+ZONES = 10    # Zone A to Zone J in columns 3 to 12, like the real sheet
+
+
+def make_workbook(path, extraRows = 0, extraColumns = 0, extraSheets = 0, seed = 0):
+    """Write a workbook with the real sheet's layout plus extraRows filler rows, extraColumns zones and extraSheets
+    copies of the sheet, returns the path"""
+    rng = random.Random(seed)
+    columns = ZONES + extraColumns
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for sheet in range(1 + extraSheets):
+        ws = wb.create_sheet('US Import Rates' if sheet == 0 else 'US Import Rates {}'.format(sheet + 1))
+        ws.cell(row = 1, column = 1, value = 'DHL RATE SHEET')
+        ws.cell(row = 13, column = 1, value = 'Non-documents from 0.5 KG & Documents from 2.5 KG')
+        ws.cell(row = 14, column = 1, value = 'KG')
+        for col in range(columns):
+            ws.cell(row = 14, column = col + 3, value = 'Zone {}'.format(col + 1))
+
+        # Rates are stored as text, like the cells of the real sheet
+        base = [rng.uniform(15, 45) for _ in range(columns)]
+        step = [rng.uniform(2, 14) for _ in range(columns)]
+        for i, row in enumerate(range(15, 155)):
+            ws.cell(row = row, column = 1, value = '{:.1f}'.format((i + 1) / 2))
+            for col in range(columns):
+                ws.cell(row = row, column = col + 3, value = '{:.2f}'.format(base[col] + step[col] * i / 2))
+
+        ws.cell(row = 156, column = 1, value = 'Multiplier rate per 1 KG from 70.1 KG')
+        ws.cell(row = 157, column = 1, value = 'From')
+        ws.cell(row = 157, column = 2, value = 'To')
+        for row, (low, high) in zip(range(158, 162), (('70.1', '150'), ('150.1', '300'), ('300.1', '999'),
+                                                       ('999.1', '99,999'))):
+            ws.cell(row = row, column = 1, value = low)
+            ws.cell(row = row, column = 2, value = high)
+            for col in range(columns):
+                ws.cell(row = row, column = col + 3, value = '{:.2f}'.format(step[col] * (1 + (row - 158) / 50)))
+
+        for row in range(162, 162 + extraRows):
+            for col in range(columns + 2):
+                ws.cell(row = row, column = col + 1, value = '{:.2f}'.format(rng.uniform(0, 1000)))
+    wb.save(path)
+    return path
+
+
+def main(argv = None):
+    """Write a synthetic workbook from the command line"""
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('path')
+    parser.add_argument('--extra-rows', type = int, default = 0)
+    parser.add_argument('--extra-columns', type = int, default = 0)
+    parser.add_argument('--extra-sheets', type = int, default = 0)
+    args = parser.parse_args(argv)
+    make_workbook(args.path, args.extra_rows, args.extra_columns, args.extra_sheets)
+
+
+if __name__ == '__main__':
+    main()
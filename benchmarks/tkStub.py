@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""A do-nothing stand-in for tkinter so the Application can be benchmarked without a display
+
+install() puts the stub in sys.modules as 'tkinter' - call it before importing dhlFreightCalculator. Widgets accept any
+arguments and ignore geometry and configuration calls; StringVar and BooleanVar hold a value; after() callbacks are
+queued and only run when run_after() is called.
+"""
+import sys
+import types
+
+
+class StringVar:
+    def __init__(self, master = None, value = ''):
+        self.value = value
+        self.traces = []
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+        for callback in list(self.traces):
+            callback('', '', 'w')
+
+    def trace(self, mode, callback):
+        self.traces.append(callback)
+        return str(len(self.traces))
+
+    def trace_add(self, mode, callback):
+        return self.trace(mode, callback)
+
+
+class BooleanVar(StringVar):
+    def __init__(self, master = None, value = False):
+        super().__init__(master, value)
+
+    def get(self):
+        return bool(self.value)
+
+
+class Misc:
+    """Base for the stub widgets - every geometry and configuration call is accepted and ignored"""
+    pendingAfter = []    # (id, callback, args) queued by after() on any widget
+    afterCount = 0
+
+    def __init__(self, master = None, *args, **kwargs):
+        self.master = master
+        self.options = dict(kwargs)
+        self.textvariable = kwargs.get('textvariable')
+
+    def after(self, ms, callback = None, *args):
+        Misc.afterCount += 1
+        afterId = 'after#{}'.format(Misc.afterCount)
+        Misc.pendingAfter.append((afterId, callback, args))
+        return afterId
+
+    def after_idle(self, callback, *args):
+        return self.after(0, callback, *args)
+
+    def after_cancel(self, afterId):
+        Misc.pendingAfter[:] = [pending for pending in Misc.pendingAfter if pending[0] != afterId]
+
+    def config(self, **kwargs):
+        self.options.update(kwargs)
+
+    configure = config
+
+    def cget(self, key):
+        return self.options.get(key)
+
+    def delete(self, first, last = None):
+        if self.textvariable is not None:
+            self.textvariable.set('')
+
+    def insert(self, index, text):
+        if self.textvariable is not None:
+            self.textvariable.set(self.textvariable.get() + text)
+
+    def __getattr__(self, name):    # place, pack, grid, destroy, bind, mainloop, title, ...
+        return lambda *args, **kwargs: None
+
+
+class Tk(Misc):
+    def __init__(self, *args, **kwargs):
+        super().__init__(None)
+
+
+class Frame(Misc):
+    pass
+
+
+class Toplevel(Misc):
+    pass
+
+
+class Label(Misc):
+    pass
+
+
+class Button(Misc):
+    def invoke(self):
+        return self.options['command']()
+
+
+class Entry(Misc):
+    pass
+
+
+class Checkbutton(Misc):
+    pass
+
+
+class Canvas(Misc):
+    pass
+
+
+class Scrollbar(Misc):
+    pass
+
+
+class OptionMenu(Misc):
+    def __init__(self, master, variable, value, *values, **kwargs):
+        super().__init__(master)
+
+
+def run_after():
+    """Run every queued after() callback, including ones queued while running, returns how many ran"""
+    count = 0
+    while Misc.pendingAfter:
+        afterId, callback, args = Misc.pendingAfter.pop(0)
+        callback(*args)
+        count += 1
+    return count
+
+
+def install():
+    """Register the stub as tkinter (and tkinter.messagebox / filedialog) in sys.modules"""
+    module = types.ModuleType('tkinter')
+    for name in ('StringVar', 'BooleanVar', 'Misc', 'Tk', 'Frame', 'Toplevel', 'Label', 'Button', 'Entry',
+                 'Checkbutton', 'Canvas', 'Scrollbar', 'OptionMenu'):
+        setattr(module, name, globals()[name])
+    module.TkVersion = 8.6
+    module.END = 'end'
+    messagebox = types.ModuleType('tkinter.messagebox')
+    messagebox.showerror = messagebox.showinfo = messagebox.showwarning = lambda *args, **kwargs: None
+    filedialog = types.ModuleType('tkinter.filedialog')
+    filedialog.asksaveasfilename = lambda *args, **kwargs: ''
+    module.messagebox = messagebox
+    module.filedialog = filedialog
+    sys.modules['tkinter'] = module
+    sys.modules['tkinter.messagebox'] = messagebox
+    sys.modules['tkinter.filedialog'] = filedialog
+    return module
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""Streaming batch quoting of CSV or JSONL shipment files from the command line
+
+Each input row describes one shipment:
+
+    country         China, Taiwan, Hong Kong or Thailand
+    method          'Per Piece' or 'Entire Shipment'
+    piece_weight    weight of 1 piece in grams (Per Piece)
+    quantities      quantities to quote, ';' separated in CSV or a list in JSONL (Per Piece)
+    gross_weight    weight of the entire shipment in kilograms (Entire Shipment)
+
+Rows are written back out in the same format with a ``costs`` field added - one cost per quantity for Per Piece, a
+single cost for Entire Shipment. Rows are read, quoted and written one at a time so memory stays flat on any size of
+file.
+
+In split mode every shipment is priced as its cheapest split into parcels (see dhlShipmentSplit) and a ``parcels``
+field lists the parcel weights in kg - ';' separated in CSV, with '|' between the splits of each quantity.
+
+With more than one worker the file is split into chunks of lines that are parsed, quoted and formatted by a process
+pool, each worker receiving the compiled rate table once when it starts. Chunks are written back in input order and
+only a few per worker are in flight at a time. In this mode a CSV record must not span lines.
+
+In columnar mode (see dhlColumnar) the output is a binary file with one record per quoted weight - each quantity of a
+Per Piece row is its own record - priced in blocks of CHUNK_ROWS weights by dhlBatchQuote's vectorized quoter.
+"""
+import collections
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import dhlQuoteEngine
+
+FORMATS = ('csv', 'jsonl')
+LIST_SEPARATOR = ';'    # Separates quantities and costs inside a CSV field
+SPLIT_SEPARATOR = '|'    # Separates the parcel lists of each quantity inside a CSV parcels field
+CHUNK_ROWS = 5000    # lines handed to a worker process at a time
+CHUNKS_IN_FLIGHT = 2    # chunks queued per worker process, bounding memory while keeping every worker busy
+COUNTRY_CODES = tuple(dhlQuoteEngine.COUNTRY_COLUMNS)    # country code of each country in columnar output
+
+_workerRates = None    # the rate table of a worker process, set once by init_worker
+_workerOptimizers = None    # split optimizers of a worker process in split mode, None otherwise
+
+
+class BatchError(Exception):
+    """An input row that cannot be quoted"""
+
+
+def to_float(value):
+    """Read a field as a float, treating blanks and anything that is not a number as 0 like the GUI does"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if not math.isfinite(number):    # nan and inf parse but cannot be priced
+        raise BatchError('{!r} is not a finite number'.format(value))
+    return number
+
+
+def detect_format(path, fmt = None):
+    """Return the format of a file, from fmt if given or else from its extension, defaulting to csv"""
+    if fmt:
+        return fmt
+    if path and path.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_rows(fh, fmt, fieldnames = None, firstRow = 1):
+    """Yield each shipment of a CSV or JSONL file as a dict, fieldnames is given when fh has no CSV header
+
+    A JSONL line that is not a JSON object raises BatchError, numbered from firstRow.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(fh, fieldnames = fieldnames):
+            quantities = row.get('quantities') or ''
+            row['quantities'] = [q for q in quantities.split(LIST_SEPARATOR) if q.strip()]
+            yield row
+    else:
+        for lineNumber, line in enumerate(fh, firstRow):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as err:
+                    raise BatchError('row {}: not valid JSON - {}'.format(lineNumber, err.msg))
+                if not isinstance(row, dict):
+                    raise BatchError('row {}: not a JSON object'.format(lineNumber))
+                yield row
+
+
+def quote_row(rateTable, row, optimizers = None):
+    """Quote a single shipment row, returns the cost or list of costs
+
+    Given a {country: SplitOptimizer} cache in optimizers the shipment is priced as its cheapest split instead and the
+    parcel weights are added to the row.
+    """
+    country = row.get('country')
+    try:
+        dhlQuoteEngine.origin_column(rateTable, country)    # a zone name too when quoting from a rate card
+    except (KeyError, TypeError):
+        raise BatchError('unknown country {!r}'.format(country))
+    method = row.get('method') or 'Per Piece'
+    if method not in ('Per Piece', 'Entire Shipment'):
+        raise BatchError('unknown method {!r}'.format(method))
+    if optimizers is not None:
+        return split_row(rateTable, row, country, method, optimizers)
+    if method == 'Per Piece':
+        return dhlQuoteEngine.quote_per_piece(rateTable, to_float(row.get('piece_weight')),
+                                              [to_float(q) for q in row_quantities(row)], country)
+    return dhlQuoteEngine.quote_shipment(rateTable, to_float(row.get('gross_weight')), country)
+
+
+def row_quantities(row):
+    """Return the quantities of a row as a list"""
+    quantities = row.get('quantities') or []
+    return quantities if isinstance(quantities, list) else [quantities]
+
+
+def split_row(rateTable, row, country, method, optimizers):
+    """Price a shipment row as its cheapest split, adding its parcel weights to the row"""
+    import dhlShipmentSplit
+
+    optimizer = dhlShipmentSplit.optimizer_for(optimizers, rateTable, country)
+    try:
+        if method == 'Entire Shipment':
+            split = optimizer.split_weight(to_float(row.get('gross_weight')))
+            row['parcels'] = [round(parcel.weight, dhlShipmentSplit.WEIGHT_PLACES) for parcel in split.parcels]
+            return split.cost
+        splits = [optimizer.split_pieces(to_float(row.get('piece_weight')), to_float(q)) for q in row_quantities(row)]
+    except ValueError as err:    # past the split limits
+        raise BatchError(str(err))
+    row['parcels'] = [[round(parcel.weight, dhlShipmentSplit.WEIGHT_PLACES) for parcel in split.parcels]
+                      for split in splits]
+    return [split.cost for split in splits]
+
+
+def quote_rows(rateTable, rows, firstRow = 1, optimizers = None):
+    """Yield each row with its costs added, as its cheapest split if given a split optimizer cache"""
+    for lineNumber, row in enumerate(rows, firstRow):
+        try:
+            row['costs'] = quote_row(rateTable, row, optimizers)
+        except BatchError as err:
+            raise BatchError('row {}: {}'.format(lineNumber, err))
+        yield row
+
+
+def write_rows(rows, fh, fmt, header = True):
+    """Write quoted rows in the given format, returns the number of rows written"""
+    count = 0
+    if fmt == 'csv':
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(fh, fieldnames = list(row), extrasaction = 'ignore', lineterminator = '\n')
+                if header:
+                    writer.writeheader()
+            row = dict(row)
+            row['quantities'] = LIST_SEPARATOR.join(str(q) for q in row['quantities'])
+            if 'parcels' in row:
+                splits = row['parcels'] if isinstance(row['costs'], list) else [row['parcels']]
+                row['parcels'] = SPLIT_SEPARATOR.join(LIST_SEPARATOR.join('{:g}'.format(w) for w in weights)
+                                                      for weights in splits)
+            if isinstance(row['costs'], list):
+                row['costs'] = LIST_SEPARATOR.join('{:.2f}'.format(c) for c in row['costs'])
+            else:
+                row['costs'] = '{:.2f}'.format(row['costs'])
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            fh.write(json.dumps(row))
+            fh.write('\n')
+            count += 1
+    return count
+
+
+def row_weights(row):
+    """Return the gross weights in kg a shipment row quotes, one per quantity for Per Piece"""
+    if row.get('country') not in dhlQuoteEngine.COUNTRY_COLUMNS:
+        raise BatchError('unknown country {!r}'.format(row.get('country')))
+    method = row.get('method') or 'Per Piece'
+    if method == 'Per Piece':
+        pieceKg = to_float(row.get('piece_weight')) / 1000
+        return [to_float(q) * pieceKg for q in row_quantities(row)]
+    if method == 'Entire Shipment':
+        return [to_float(row.get('gross_weight'))]
+    raise BatchError('unknown method {!r}'.format(method))
+
+
+def write_columnar(rateTable, rows, path, chunkRows = CHUNK_ROWS):
+    """Quote shipment rows into a columnar file, a block of weights at a time, returns the number of rows"""
+    import numpy as np
+
+    import dhlBatchQuote
+    import dhlColumnar
+
+    quoter = dhlBatchQuote.BatchQuoter(rateTable, COUNTRY_CODES)
+
+    def flush(weights, codes):
+        adjusted = dhlBatchQuote.adjust_weights(weights)
+        buffered = quoter.buffer(adjusted)
+        codes = np.array(codes, dtype = np.uint8)
+        costs = quoter.cost(buffered)[np.arange(len(codes)), codes]    # each weight's own country column
+        writer.append(np.array(weights, dtype = np.float64), adjusted, buffered, costs, codes)
+
+    count = 0
+    weights, codes = [], []
+    with dhlColumnar.ColumnarWriter(path, COUNTRY_CODES) as writer:
+        for lineNumber, row in enumerate(rows, 1):
+            try:
+                rowWeights = row_weights(row)
+            except BatchError as err:
+                raise BatchError('row {}: {}'.format(lineNumber, err))
+            weights.extend(rowWeights)
+            codes.extend([COUNTRY_CODES.index(row['country'])] * len(rowWeights))
+            count += 1
+            if len(weights) >= chunkRows:
+                flush(weights, codes)
+                weights, codes = [], []
+        if weights:
+            flush(weights, codes)
+    return count
+
+
+def init_worker(rates, split = False):
+    """Process pool initializer - rebuild the rate table (or dhlRateCards.RateCard) sent from the parent once per
+    worker"""
+    global _workerRates, _workerOptimizers
+    if 'sheet' in rates:
+        import dhlRateCards
+        _workerRates = dhlRateCards.RateCard.from_dict(rates)
+    else:
+        _workerRates = dhlQuoteEngine.RateTable.from_dict(rates)
+    _workerOptimizers = {} if split else None
+
+
+def quote_chunk(fmt, fieldnames, lines, firstRow, header):
+    """Parse, quote and format a chunk of input lines in a worker, returns the output text and its row count"""
+    out = io.StringIO()
+    rows = quote_rows(_workerRates, read_rows(lines, fmt, fieldnames, firstRow), firstRow, _workerOptimizers)
+    count = write_rows(rows, out, fmt, header)
+    return out.getvalue(), count
+
+
+def read_chunks(fh, size):
+    """Yield lists of up to size lines"""
+    chunk = []
+    for line in fh:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parallel_batch(rateTable, inFile, outFile, fmt, workers, chunkRows = CHUNK_ROWS, split = False):
+    """Quote a file across a process pool, writing results in input order, returns the number of rows"""
+    fieldnames = None
+    if fmt == 'csv':
+        headerLine = inFile.readline()
+        if not headerLine:
+            return 0
+        fieldnames = next(csv.reader([headerLine]))
+
+    count = 0
+    pending = collections.deque()
+    with ProcessPoolExecutor(workers, initializer = init_worker, initargs = (rateTable.to_dict(), split)) as pool:
+        for index, lines in enumerate(read_chunks(inFile, chunkRows)):
+            pending.append(pool.submit(quote_chunk, fmt, fieldnames, lines, index * chunkRows + 1, index == 0))
+            while len(pending) >= workers * CHUNKS_IN_FLIGHT:
+                text, rows = pending.popleft().result()
+                outFile.write(text)
+                count += rows
+        while pending:
+            text, rows = pending.popleft().result()
+            outFile.write(text)
+            count += rows
+    return count
+
+
+def run_batch(rateTable, inPath = '-', outPath = '-', fmt = None, workers = 1, split = False, columnar = False):
+    """Quote every shipment in inPath and write them to outPath ('-' for stdin/stdout), reports rows/sec on stderr
+
+    workers > 1 quotes on a process pool of that size, 0 uses one worker per CPU. split prices every shipment as its
+    cheapest split into parcels. columnar writes a dhlColumnar file instead, in this process, to a named outPath.
+    """
+    if columnar and (outPath == '-' or split):
+        raise BatchError('columnar output needs an --output file and cannot be split')
+    fmt = detect_format(inPath if inPath != '-' else None, fmt)
+    workers = workers or os.cpu_count() or 1
+    inFile = sys.stdin if inPath == '-' else open(inPath, 'r', newline = '')
+    outFile = None if columnar else sys.stdout if outPath == '-' else open(outPath, 'w', newline = '')
+    start = time.perf_counter()
+    try:
+        if columnar:
+            count = write_columnar(rateTable, read_rows(inFile, fmt), outPath)
+        elif workers > 1:
+            count = parallel_batch(rateTable, inFile, outFile, fmt, workers, split = split)
+        else:
+            rows = quote_rows(rateTable, read_rows(inFile, fmt), optimizers = {} if split else None)
+            count = write_rows(rows, outFile, fmt)
+        if outFile is not None:
+            outFile.flush()
+    finally:
+        if inFile is not sys.stdin:
+            inFile.close()
+        if outFile not in (None, sys.stdout):
+            outFile.close()
+    elapsed = time.perf_counter() - start
+    print('Quoted {:,} rows in {:.2f}s ({:,.0f} rows/sec)'.format(count, elapsed, count / elapsed if elapsed else 0),
+          file = sys.stderr)
+    return count
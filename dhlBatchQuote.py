@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Vectorized NumPy quoting of many weights against every origin column at once"""
+import numpy as np
+
+import dhlQuoteEngine
+
+ORIGINS = ('China', 'Taiwan', 'Thailand')    # One per rate sheet column - Hong Kong shares Taiwan's column
+
+
+def adjust_weights(weights):
+    """Rounds every weight up to the nearest 1/2 KG, matching dhlQuoteEngine.adjust_weight"""
+    weights = np.asarray(weights, dtype = np.float64)
+    whole = np.trunc(weights)
+    dec = weights - whole
+    return whole + np.where((dec < .5) & (dec > 0), .5, np.where(dec >= .5, 1.0, 0.0))
+
+
+class BatchQuoter:
+    """Rate table and buffer tiers laid out as arrays for vectorized quoting
+
+    ``tableCosts`` has one row per half kg unit from 0 to the table's tableLimit and one column per origin, holding NaN
+    where the rate sheet has no entry. ``bandRates`` holds the per kg multipliers of each band for each origin.
+    """
+
+    def __init__(self, rateTable, countries = ORIGINS, bufferDict = dhlQuoteEngine.BUFFER_DICT):
+        self.countries = tuple(countries)
+        self.columns = [dhlQuoteEngine.origin_column(rateTable, country) for country in self.countries]
+
+        self.tableLimit = rateTable.tableLimit
+        maxUnits = int(self.tableLimit * 2)
+        self.tableCosts = np.full((maxUnits + 1, len(self.columns)), np.nan)
+        for j, col in enumerate(self.columns):
+            for units, cost in rateTable.table[col].items():
+                if 0 <= units <= maxUnits:
+                    self.tableCosts[units, j] = cost
+        self.bandRates = np.array([rateTable.bands[col] for col in self.columns], dtype = np.float64).T
+        self.bandLimits = np.array(rateTable.bandLimits, dtype = np.float64)
+
+        self.bufferWeights = np.array(list(bufferDict.keys()), dtype = np.float64)
+        self.bufferValues = np.append(np.array(list(bufferDict.values()), dtype = np.float64),
+                                      dhlQuoteEngine.BUFFER_MAX)
+
+    def buffer(self, adjusted):
+        """Adds the bufferDict tier of each weight, the first tier whose weight is >= the adjusted weight"""
+        adjusted = np.asarray(adjusted, dtype = np.float64)
+        return adjusted + self.bufferValues[np.searchsorted(self.bufferWeights, adjusted, side = 'left')]
+
+    def cost(self, buffered):
+        """Price rounded and buffered weights, returns an (n, origins) matrix"""
+        wt = np.asarray(buffered, dtype = np.float64)[:, None]
+        units = wt * 2
+        onGrid = (units == np.trunc(units)) & (wt > 0) & (wt <= self.tableLimit)
+        index = np.where(onGrid, units, 0).astype(np.intp)[:, 0]
+        tableCost = np.where(onGrid, self.tableCosts[index], np.nan)
+        tableCost = np.where(np.isnan(tableCost), wt, tableCost)    # no matching row leaves the weight untouched
+
+        bandCost = wt * self.bandRates[np.searchsorted(self.bandLimits, wt[:, 0], side = 'left')]
+
+        return np.where(wt <= 0, 0.0, np.where(wt <= self.tableLimit, tableCost, bandCost))
+
+    def quote(self, weights):
+        """Round, buffer and price gross weights in kilograms, returns an (n, origins) cost matrix"""
+        return self.cost(self.buffer(adjust_weights(weights)))
+
+    def quote_pieces(self, pieceWeights, quantities):
+        """Quote per piece weights in grams times their quantities, returns an (n, origins) cost matrix"""
+        pieceKg = np.asarray(pieceWeights, dtype = np.float64) / 1000
+        return self.quote(np.asarray(quantities, dtype = np.float64) * pieceKg)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""A columnar binary file of bulk quote results that readers memory-map instead of parsing
+
+Layout, all little endian:
+
+    magic       8 bytes 'DHLQCOL1'
+    size        uint32, bytes of the JSON header that follows
+    header      JSON - count, countries, and each column's name, type code and byte offset
+    columns     one fixed width array per column, each starting on a 64 byte boundary
+
+Each quote is one row across the columns: the gross ``weight`` in kg, the ``adjusted`` (rounded up to the half kg)
+and ``buffered`` weights, the ``cost`` - all float64 - and the origin as a uint8 ``country`` code indexing the
+header's countries list. Rows are only added at the end, so the writer streams each column to a temporary file and
+the columns are laid out one after another when it is closed.
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b'DHLQCOL1'
+ALIGN = 64    # byte alignment of every column, so each maps as an aligned array
+COLUMNS = (    # name, array type code, NumPy dtype
+    ('weight', 'd', '<f8'),
+    ('adjusted', 'd', '<f8'),
+    ('buffered', 'd', '<f8'),
+    ('cost', 'd', '<f8'),
+    ('country', 'B', 'u1')
+)
+
+
+def aligned(offset):
+    """Round a byte offset up to the next column boundary"""
+    return -(-offset // ALIGN) * ALIGN
+
+
+def to_bytes(values, typeCode):
+    """Return the little endian bytes of a sequence or NumPy array of values"""
+    if hasattr(values, 'astype'):    # NumPy array
+        dtype = dict((code, dtype) for _, code, dtype in COLUMNS)[typeCode]
+        return values.astype(dtype, copy = False).tobytes()
+    values = array(typeCode, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+class ColumnarWriter:
+    """Writes quote rows to a columnar file - use as a context manager or call close() to finish the file"""
+
+    def __init__(self, path, countries):
+        self.path = path
+        self.countries = list(countries)
+        self.count = 0
+        self.parts = {name: tempfile.TemporaryFile() for name, _, _ in COLUMNS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        if excType is None:
+            self.close()
+        else:
+            self.discard()
+
+    def append(self, weight, adjusted, buffered, cost, country):
+        """Add rows given as equal length sequences or NumPy arrays, one per column"""
+        values = {'weight': weight, 'adjusted': adjusted, 'buffered': buffered, 'cost': cost, 'country': country}
+        for name, typeCode, _ in COLUMNS:
+            self.parts[name].write(to_bytes(values[name], typeCode))
+        self.count += len(weight)
+
+    def close(self):
+        """Lay out the header and columns in the output file"""
+        columns = [{'name': name, 'type': typeCode, 'dtype': dtype, 'offset': 0} for name, typeCode, dtype in COLUMNS]
+        header = {'version': 1, 'count': self.count, 'countries': self.countries, 'columns': columns}
+        dataStart = -1
+        while True:    # the offsets are stored in the header, so lay out until its length stops moving them
+            headerBytes = json.dumps(header, separators = (',', ':')).encode()
+            start = aligned(len(MAGIC) + 4 + len(headerBytes))
+            if start == dataStart:
+                break
+            dataStart = offset = start
+            for column in columns:
+                column['offset'] = offset
+                offset = aligned(offset + self.count * array(column['type']).itemsize)
+
+        with open(self.path, 'wb') as fh:
+            fh.write(MAGIC + struct.pack('<I', len(headerBytes)) + headerBytes)
+            for column in columns:
+                fh.write(b'\0' * (column['offset'] - fh.tell()))
+                part = self.parts[column['name']]
+                part.seek(0)
+                shutil.copyfileobj(part, fh, 1 << 20)
+        self.discard()
+
+    def discard(self):
+        """Drop the temporary column files without writing the output"""
+        for part in self.parts.values():
+            part.close()
+
+
+def read_header(fh):
+    """Read and check the header of an open columnar file"""
+    magic = fh.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ValueError('not a columnar quote file')
+    size, = struct.unpack('<I', fh.read(4))
+    return json.loads(fh.read(size).decode())
+
+
+class ColumnarReader:
+    """A memory-mapped columnar file - column() returns zero copy memoryviews that slice without copying"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self.header = read_header(fh)
+            self.map = mmap.mmap(fh.fileno(), 0, access = mmap.ACCESS_READ) if os.fstat(fh.fileno()).st_size else None
+        self.count = self.header['count']
+        self.countries = self.header['countries']
+        self.offsets = {column['name']: (column['offset'], column['type']) for column in self.header['columns']}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def column(self, name):
+        """Return a column as a memoryview of its values, straight from the mapped file"""
+        if sys.byteorder != 'little':
+            raise ValueError('memoryview columns need a little endian machine, use load_numpy')
+        offset, typeCode = self.offsets[name]
+        size = array(typeCode).itemsize
+        return memoryview(self.map)[offset:offset + self.count * size].cast(typeCode)
+
+    def row(self, index):
+        """Return one quote as a dict, with the country by name"""
+        row = {name: self.column(name)[index] for name in self.offsets}
+        row['country'] = self.countries[row['country']]
+        return row
+
+    def close(self):
+        """Unmap the file - any memoryview from column() must be released first"""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+def load_numpy(path):
+    """Return {column name: read only NumPy array} mapped straight from the file, plus 'countries'"""
+    import numpy as np
+
+    with open(path, 'rb') as fh:
+        header = read_header(fh)
+    arrays = {'countries': header['countries']}
+    for column in header['columns']:
+        if header['count']:
+            arrays[column['name']] = np.memmap(path, dtype = column['dtype'], mode = 'r', offset = column['offset'],
+                                               shape = (header['count'],))
+        else:
+            arrays[column['name']] = np.empty(0, dtype = column['dtype'])
+    return arrays
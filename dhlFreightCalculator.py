@@ -1,483 +1,965 @@
-#!/usr/bin/env python
-"""A freight calculator that uses a Tkinter GUI and pulls rates from a DHL rate .xlsx file"""
-import os
-import sys
-import openpyxl
-import tkinter as tk
-import warnings
-
-__author__ = 'Andrew Rice'
-__copyright__ = 'Copyright 2019, Andrew Rice'
-__credits__ = []
-__license__ = ''
-__version__ = '2.0'
-__maintainer__ = 'Andrew Rice'
-__email__ = ''
-__status__ = 'Complete'
-
-
-class Application(tk.Frame):
-    def __init__(self, master = None):
-        super().__init__(master)
-        self.master = master
-
-        # Variables for the DHL rate worksheet
-        self.wb = None
-        self.ratesWS = None
-
-        self.countries = {'China', 'Taiwan', 'Hong Kong', 'Thailand'}
-        self.country = 'China'    # The country chosen by the user to generate a landed freight quote from
-        self.countryColumn = None    # The corresponding column of export country on the DHL .XLSX sheet
-        self.countryChoices = None
-        self.countryMenu = None
-
-        # Method is the basis the user decides to quote by - weight per piece or weight of entire shipment
-        self.methods = {'Per Piece', 'Entire Shipment'}
-        self.method = 'Per Piece'    # default to calculate freight on per piece basis
-        self.methodChoices = None
-        self.methodMenu = None
-
-        self.pieceWeightEntry = None  # entry box for weight of 1 piece
-        self.pieceWeight = tk.StringVar()
-        self.qty1 = tk.StringVar()
-        self.qty1Float = 0.0
-        self.qtyEntry1 = None
-        self.qty2 = tk.StringVar()
-        self.qty2Float = 0.0
-        self.qtyEntry2 = None
-        self.qty3 = tk.StringVar()
-        self.qty3Float = 0.0
-        self.qtyEntry3 = None
-        self.qty4 = tk.StringVar()
-        self.qty4Float = 0.0
-        self.qtyEntry4 = None
-        self.qty5 = tk.StringVar()
-        self.qty5Float = 0.0
-        self.qtyEntry5 = None
-
-        self.grossWeight = tk.StringVar()    # gross weight of entire shipment
-        self.grossWeightEntry = None    # entry box for weight of entire shipment
-
-        self.headerFrame = None
-        self.headerLabel = None
-        self.instructionFrame = None
-        self.instructionLabel = None
-        self.countryFrame = None
-        self.weightFrame = None
-        self.footerFrame = None
-
-        self.rateLabel1 = None    # Always a text label saying 'The cost of this shipment is estimated at:'
-        self.rateLabel2 = None
-        self.rateLabel3 = None
-        self.rateLabel4 = None
-        self.rateLabel5 = None
-        self.rateLabel6 = None
-
-        # Buttons
-        self.calculateButton = None
-        self.clearButton = None
-        self.quitButton = None
-
-        # Weight values and lists
-        self.weightFloat = 0.0
-        self.adjustedWeight = 0
-        self.quotedWeight = 0    # final weight when quoting by entire shipment
-        self.bufferDict = {    # Key = weight; Value = buffer to add
-            0: 0,
-            5: 1,
-            10: 2,
-            25: 2.5,
-            50: 5,
-            75: 8,
-            100: 12,
-            150: 17,
-            200: 20,
-            500: 35
-        }
-        self.freight_cost_raw = []
-        self.freight_cost_adjusted = []
-        self.freight_cost_buffed = []
-        self.freight_cost_final = []  # final weight when quoting by individual quantities
-
-        # Initializing functions
-        self.pack()
-        self.create_widgets()
-        self.initialize_rates()
-
-    def create_widgets(self):
-        """Creates all widgets"""
-        # create the Header Frame
-        self.headerFrame = tk.Frame(self.master, width = 600, height = 50, bd = 1, highlightbackground = 'black',
-                                    highlightcolor = 'black', highlightthickness = 0)
-        self.headerFrame.place(x = 0, y = 0)
-        self.headerFrame.pack_propagate(False)
-        self.headerLabel = tk.Label(self.headerFrame, text = 'DHL Freight Calculator', fg = 'red',
-                                    font = ('calibri', 16))
-        self.headerLabel.place(x = 300, y = 37.5, anchor = 'center')
-
-        # Create an instruction box underneath the header
-        self.instructionFrame = tk.Frame(self.master, width = 600, height = 150, bd = 0, highlightbackground = 'black',
-                                         highlightcolor = 'black', highlightthickness = 0)
-        self.instructionFrame.place(x=0, y=50)
-        self.instructionFrame.pack_propagate(False)
-        self.instructionLabel = tk.Label(self.instructionFrame, text = 'This is a comprehensive freight quote '
-                                                                       'generator that uses our custom DHL rates to '
-                                                                       'generate a freight quote based on multiple '
-                                                                       'quantities and country of origin. Please '
-                                                                       'select a country from the drop down menu, '
-                                                                       'enter the quantities you would like to quote, '
-                                                                       'and the weight of 1 piece to generate a quote. '
-                                                                       'Alternatively, if you know the weight of the '
-                                                                       'entire shipment, please select that option '
-                                                                       'and enter the gross weight to generate your '
-                                                                       'quote.',
-                                         height = 125, wraplength = 450, justify = 'center', font = ('calibri', 10))
-        self.instructionLabel.place(x = 300, y = 75, anchor = 'center')
-
-        # Create Frame where user is able to select country and method
-        self.countryFrame = tk.Frame(self.master, width = 600, height = 50, bd = 1, highlightbackground = 'black',
-                                     highlightcolor = 'black', highlightthickness = 0)
-        self.countryFrame.place(x = 0, y = 200)
-
-        # TODO: change menu and choices for country and method from grid to place
-        # Create a drop down for users to choose which country they are exporting from
-        self.countryChoices = tk.StringVar(self.master)
-        self.countryChoices.set('China')
-        self.countryMenu = tk.OptionMenu(self.countryFrame, self.countryChoices, *self.countries)
-        tk.Label(self.countryFrame, text = 'Select a Country:').grid(row = 1, column = 1, padx = 20)
-        self.countryMenu.grid(row = 1, column = 2)
-        self.countryChoices.trace('w', self.change_country_dropdown)
-
-        # Create a drop down for users to choose whether they are quoting weight per piece or entire shipment
-        self.methodChoices = tk.StringVar(self.master)
-        self.methodChoices.set('Per Piece')
-        self.methodMenu = tk.OptionMenu(self.countryFrame, self.methodChoices, *self.methods)
-        tk.Label(self.countryFrame, text = 'How are you calculating freight:').grid(row = 1, column = 3, padx = 20)
-        self.methodMenu.grid(row = 1, column = 4)
-        self.methodChoices.trace('w', self.change_method_dropdown)
-
-        # Initialize weight frame
-        self.set_weight_frame()
-
-        # Create Footer Frame
-        self.footerFrame = tk.Frame(self.master, width = 600, height = 50, bd = 1, highlightbackground = 'black',
-                                    highlightcolor = 'black', highlightthickness = 0)
-        self.footerFrame.place(x = 0, y = 700)
-
-        # Create calculate button using generate_report script
-        self.calculateButton = tk.Button(self.footerFrame, text = 'Calculate', command = self.generate_report,
-                                         cursor = 'hand2')
-        self.calculateButton.place(x = 225, y = 10, height = 30, width = 150)
-
-        # Create a 'clear fields' button that wipes the form clean and allows users to run another quote
-        self.clearButton = tk.Button(self.footerFrame, text = 'Clear Fields', command = self.clear_fields,
-                                     cursor = 'hand2')
-        self.clearButton.place(x = 25, y = 10, height = 30, width = 75)
-
-        # Create a quit button
-        self.quitButton = tk.Button(self.footerFrame, text = 'Quit', command = self.quit_application, cursor = 'hand2')
-        self.quitButton.place(x = 500, y = 10, height = 30, width = 75)
-
-        # TODO: Create label with program & copyright info
-
-    def resourcePath(self, relativePath):
-        """ Get absolute path to resource, works for dev and for PyInstaller """
-        try:
-            # PyInstaller creates a temp folder and stores path in _MEIPASS
-            basePath = sys._MEIPASS
-        except Exception:
-            basePath = os.path.abspath(".")
-
-        return os.path.join(basePath, relativePath)
-
-    def initialize_rates(self):
-        """Initialize freight rates from DHL excel workbook"""
-        with warnings.catch_warnings():  # .wmf image in the excel file causes a warning
-            warnings.simplefilter('ignore')
-            self.wb = openpyxl.load_workbook(self.resourcePath('./dhlRates.xlsx'), data_only = True)
-            self.ratesWS = self.wb['US Import Rates']  # import rates
-
-    def change_country_dropdown(self, *args):
-        """Sets the country variable when users select a different country from the dropdown menu"""
-        self.country = str(self.countryChoices.get())
-
-    def change_method_dropdown(self, *args):
-        """Change the dropdown menu for quote method - calls set_weight_frame"""
-        self.clear_fields()
-        self.method = str(self.methodChoices.get())
-        self.weightFrame.destroy()
-
-        # reset weight frame
-        self.set_weight_frame()
-
-    def set_weight_frame(self):
-        """Set the weight frame that allows users to input quantities and weights, refreshes based on method"""
-        self.weightFrame = tk.Frame(self.master, width = 600, height = 450, bd = 1, highlightbackground = 'black',
-                                    highlightcolor = 'black', highlightthickness = 0)
-        self.weightFrame.place(x = 0, y = 250)
-        if self.method == 'Per Piece':
-            tk.Label(self.weightFrame, text = 'Weight of 1 piece in grams (g):').place(x = 150, y = 15)
-            self.pieceWeightEntry = tk.Entry(self.weightFrame, textvariable = self.pieceWeight)
-            self.pieceWeightEntry.place(x = 325, y = 15)
-            tk.Label(self.weightFrame, text = "Quantity 1:").place(x = 75, y= 75)
-            tk.Label(self.weightFrame, text = "Quantity 2:").place(x = 75, y = 125)
-            tk.Label(self.weightFrame, text = "Quantity 3:").place(x = 75, y = 175)
-            tk.Label(self.weightFrame, text = "Quantity 4:").place(x = 75, y = 225)
-            tk.Label(self.weightFrame, text = "Quantity 5:").place(x = 75, y = 275)
-            self.qtyEntry1 = tk.Entry(self.weightFrame, textvariable = self.qty1)
-            self.qtyEntry2 = tk.Entry(self.weightFrame, textvariable = self.qty2)
-            self.qtyEntry3 = tk.Entry(self.weightFrame, textvariable = self.qty3)
-            self.qtyEntry4 = tk.Entry(self.weightFrame, textvariable = self.qty4)
-            self.qtyEntry5 = tk.Entry(self.weightFrame, textvariable = self.qty5)
-            self.qtyEntry1.place(x = 150, y = 75)
-            self.qtyEntry2.place(x = 150, y = 125)
-            self.qtyEntry3.place(x = 150, y = 175)
-            self.qtyEntry4.place(x = 150, y = 225)
-            self.qtyEntry5.place(x = 150, y = 275)
-
-        else:
-            # Create a box for user to enter weight entire shipment
-            tk.Label(self.weightFrame, text = 'Gross Weight of Shipment in Kilograms (kg):').place(x = 75, y = 15)
-            # self.grossWeight = tk.StringVar()
-            self.grossWeightEntry = tk.Entry(self.weightFrame, textvariable = self.grossWeight)
-            self.grossWeightEntry.place(x = 325, y = 15)
-            # TODO: Bind the entry field to the enter key, so when the user hits enter it runs the script
-            # self.grossWeightEntry.bind('<Return>', self.calculateButton.invoke())
-
-    def generate_report(self):
-        """Grab the weight and quantity value and generate a value or list of values determined by method"""
-        try:
-            if self.method == 'Per Piece':
-                try:
-                    self.weightFloat = float(self.pieceWeight.get())/1000    # set weight of 1 pc in kilograms
-                except ValueError:
-                    pass
-                try:
-                    self.qty1Float = float(self.qty1.get())
-                except ValueError:
-                    self.qty1Float = 0
-                try:
-                    self.qty2Float = float(self.qty2.get())
-                except ValueError:
-                    self.qty2Float = 0
-                try:
-                    self.qty3Float = float(self.qty3.get())
-                except ValueError:
-                    self.qty3Float = 0
-                try:
-                    self.qty4Float = float(self.qty4.get())
-                except ValueError:
-                    self.qty4Float = 0
-                try:
-                    self.qty5Float = float(self.qty5.get())
-                except ValueError:
-                    self.qty5Float = 0
-
-                self.freight_cost_raw = [float(self.qty1Float * self.weightFloat),
-                                         float(self.qty2Float * self.weightFloat),
-                                         float(self.qty3Float * self.weightFloat),
-                                         float(self.qty4Float * self.weightFloat),
-                                         float(self.qty5Float * self.weightFloat)]
-                self.adjust()
-                self.buffer()
-                self.set_country_column()
-                self.generate_cost()
-                self.display_rates()
-
-                # Clear lists to allow user to calculate again
-                self.weightFloat = 0
-                self.freight_cost_raw = []
-                self.freight_cost_adjusted = []
-                self.freight_cost_buffed = []
-                self.freight_cost_final = []
-            else:
-                try:
-                    self.freight_cost_raw = [float(self.grossWeight.get())]
-                except ValueError:
-                    self.freight_cost_raw = 0
-                try:
-                    self.weightFloat = float(self.grossWeight.get())
-                except ValueError:
-                    self.weightFloat = 0
-                self.adjust()
-                self.buffer()
-                self.set_country_column()
-                self.generate_cost()
-                self.display_rates()
-
-                self.weightFloat = 0
-                self.freight_cost_raw = 0
-        except AttributeError as err:
-            print(err)
-            pass
-
-    def adjust(self):
-        """Rounds the calculated weight up to the nearest 1/2 KG"""
-        if self.method == 'Per Piece':
-            for i in self.freight_cost_raw:
-                dec = float(i) - int(i)
-                if (dec < .5) and (dec > 0):
-                    dec = .5
-                elif dec >= .5:
-                    dec = 1
-                else:
-                    dec = 0
-                self.freight_cost_adjusted.append(int(i) + dec)
-        else:
-            dec = float(self.weightFloat) - int(self.weightFloat)
-            if (dec < .5) and (dec > 0):
-                dec = .5
-            elif dec >= .5:
-                dec = 1
-            else:
-                dec = 0
-            self.adjustedWeight = int(self.weightFloat) + dec
-
-    def buffer(self):  # Add a buffer to the calculated weights
-        """Adds a buffer to the weight to give cushion when estimating"""
-        buffer = 0
-        if self.method == 'Per Piece':
-            for i in self.freight_cost_adjusted:
-                for wt, bf in self.bufferDict.items():
-                    if i <= wt:
-                        buffer = bf
-                        break
-                    else:
-                        buffer = 40
-                self.freight_cost_buffed.append(float(i) + buffer)
-        else:
-            for wt, bf in self.bufferDict.items():
-                if self.adjustedWeight <= wt:
-                    buffer = bf
-                    break
-                else:
-                    buffer = 40
-            self.adjustedWeight += buffer
-
-    def set_country_column(self):
-        """Set the country column variable when the user changes the active country"""
-        if self.country == 'China':
-            self.countryColumn = 9
-        elif self.country == 'Taiwan' or self.country == 'Hong Kong':
-            self.countryColumn = 10
-        elif self.country == 'Thailand':
-            self.countryColumn = 11
-
-    def generate_cost(self):
-        """Iterate through the weight list to calculate a cost using the DHL rate sheet"""
-        if self.method == 'Per Piece':
-            for x in self.freight_cost_buffed:
-                wt = float(x)
-                col = self.countryColumn
-                if wt <= 0:
-                    wt = 0
-                elif wt <= 70:
-                    for i in range(15, 155, 1):
-                        if wt == float(self.ratesWS.cell(row = i, column = 1).value):
-                            wt = float(self.ratesWS.cell(row = i, column = col).value)
-                elif wt <= 150:
-                    wt *= float(self.ratesWS.cell(row = 158, column = col).value)
-                elif wt <= 300:
-                    wt *= float(self.ratesWS.cell(row = 159, column = col).value)
-                elif wt <= 999:
-                    wt *= float(self.ratesWS.cell(row = 160, column = col).value)
-                else:
-                    wt *= float(self.ratesWS.cell(row = 161, column = col).value)
-                self.freight_cost_final.append(wt)
-        else:
-            wt = float(self.adjustedWeight)
-            col = self.countryColumn
-            if wt <= 70:
-                for i in range(15, 155, 1):
-                    if wt == float(self.ratesWS.cell(row = i, column = 1).value):
-                        wt = float(self.ratesWS.cell(row = i, column = col).value)
-            elif wt <= 150:
-                wt *= float(self.ratesWS.cell(row = 158, column = col).value)
-            elif wt <= 300:
-                wt *= float(self.ratesWS.cell(row = 159, column = col).value)
-            elif wt <= 999:
-                wt *= float(self.ratesWS.cell(row = 160, column = col).value)
-            else:
-                wt *= float(self.ratesWS.cell(row = 161, column = col).value)
-            self.quotedWeight = wt
-
-    def display_rates(self):
-        """Open a second tkinter window that displays the quoted rate calculated by the program"""
-        try:
-            self.rateLabel1.destroy()
-            self.rateLabel2.destroy()
-            self.rateLabel3.destroy()
-            self.rateLabel4.destroy()
-            self.rateLabel5.destroy()
-            self.rateLabel6.destroy()
-        except AttributeError:
-            pass
-
-        self.rateLabel1 = tk.Label(self.weightFrame, text = 'The costs of this shipment are estimated at:')
-
-        if self.method == 'Per Piece':
-            self.rateLabel2 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[0]),
-                                       fg = 'green', font = 14)
-            self.rateLabel3 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[1]),
-                                       fg = 'green', font = 14)
-            self.rateLabel4 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[2]),
-                                       fg = 'green', font = 14)
-            self.rateLabel5 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[3]),
-                                       fg = 'green', font = 14)
-            self.rateLabel6 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[4]),
-                                       fg = 'green', font = 14)
-
-            if self.freight_cost_final[0] > 0:
-                self.rateLabel2.place(x = 300, y = 70)
-            if self.freight_cost_final[1] > 0:
-                self.rateLabel3.place(x = 300, y = 120)
-            if self.freight_cost_final[2] > 0:
-                self.rateLabel4.place(x = 300, y = 170)
-            if self.freight_cost_final[3] > 0:
-                self.rateLabel5.place(x = 300, y = 220)
-            if self.freight_cost_final[4] > 0:
-                self.rateLabel6.place(x = 300, y = 270)
-        else:
-            self.rateLabel2 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.quotedWeight),
-                                       fg = 'green', font = 16)
-            if self.quotedWeight > 0:
-                self.rateLabel1.place(x = 300, y = 100, anchor = 'center')
-                self.rateLabel2.place(x = 300, y = 130, anchor = 'center')
-
-    def clear_fields(self):
-        """Clear all fields in the weightFrame"""
-        try:
-            if self.method == 'Per Piece':
-                self.pieceWeightEntry.delete(0, 'end')
-                self.qtyEntry1.delete(0, 'end')
-                self.qtyEntry2.delete(0, 'end')
-                self.qtyEntry3.delete(0, 'end')
-                self.qtyEntry4.delete(0, 'end')
-                self.qtyEntry5.delete(0, 'end')
-                self.rateLabel1.destroy()
-                self.rateLabel2.destroy()
-                self.rateLabel3.destroy()
-                self.rateLabel4.destroy()
-                self.rateLabel5.destroy()
-                self.rateLabel6.destroy()
-            else:
-                self.grossWeightEntry.delete(0, 'end')
-                self.rateLabel1.destroy()
-                self.rateLabel2.destroy()
-        except AttributeError:
-            pass
-
-    def quit_application(self):
-        """Quit the application"""
-        self.wb.close()
-        self.master.destroy()
-
-
-if __name__ == '__main__':
-    calcApp = tk.Tk()
-    calcApp.title('DHL Freight Calculator')
-    calcApp.geometry('600x750')
-    calcApp.resizable(0, 0)
-    app = Application(master = calcApp)
-    app.mainloop()
-    app.wb.close()
+#!/usr/bin/env python
+"""A freight calculator that uses a Tkinter GUI and pulls rates from a DHL rate .xlsx file"""
+import time
+_launchTime = time.perf_counter()    # taken before any other import so --startup-timing can report import time
+
+import argparse
+import math
+import os
+import queue
+import sys
+import threading
+import tkinter as tk
+from tkinter import filedialog, messagebox
+
+import dhlMetrics
+import dhlQuoteEngine
+import dhlRateCache
+import dhlRateWatcher
+
+# dhlBatchCli, dhlQuoteServer, dhlRateDiff, dhlQuoteHistory, openpyxl and the NumPy based dhlQuoteCurve and
+# dhlShipmentSplit are imported only by the modes that need them, keeping window startup fast
+
+__author__ = 'Andrew Rice'
+__copyright__ = 'Copyright 2019, Andrew Rice'
+__credits__ = []
+__license__ = ''
+__version__ = '2.0'
+__maintainer__ = 'Andrew Rice'
+__email__ = ''
+__status__ = 'Complete'
+
+LOAD_POLL_MS = 50    # how often the mainloop checks whether the rate loader thread has finished
+SWEEP_ROW_HEIGHT = 20    # pixels per row of the quantity break table
+LIVE_DEBOUNCE_MS = 250    # pause in typing before a live quote is computed
+LIVE_POLL_MS = 20    # how often the mainloop checks for a finished live quote
+LIVE_METHODS = ('Per Piece', 'Entire Shipment')    # methods quoted as you type
+
+
+class StartupTimer:
+    """Records when each startup stage finished, printed by --startup-timing once the window is ready"""
+
+    def __init__(self, start):
+        self.start = start
+        self.stages = []    # (stage, ms since launch, note)
+
+    def mark(self, stage, note = ''):
+        """Record that a stage has just finished"""
+        self.stages.append((stage, (time.perf_counter() - self.start) * 1000, note))
+
+    def done(self, *stages):
+        """Return True once every named stage has been recorded"""
+        recorded = {stage for stage, _, _ in self.stages}
+        return all(stage in recorded for stage in stages)
+
+    def report(self):
+        """Return the recorded stages as a printable report"""
+        lines = ['Startup timing (ms since launch):']
+        for stage, ms, note in sorted(self.stages, key = lambda s: s[1]):
+            lines.append('  {:<16}{:>9.1f}  {}'.format(stage, ms, note).rstrip())
+        return '\n'.join(lines)
+
+
+class LiveQuoter(threading.Thread):
+    """Worker thread that computes live quotes off the Tk main thread
+
+    Requests carry the rate table to use and a snapshot of the inputs read on the main thread, so the worker never
+    touches a widget. When several requests are queued only the newest is computed. Results are left on ``results``
+    for the mainloop to collect. compute(rateTable, inputs) does the work, Application.compute_quote by default.
+    """
+
+    def __init__(self, compute = None, name = 'LiveQuoter'):
+        super().__init__(name = name, daemon = True)
+        self.compute = compute if compute is not None else Application.compute_quote
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+
+    def submit(self, generation, rateTable, inputs):
+        """Queue a quote, superseding any request that has not started yet"""
+        self.requests.put((generation, rateTable, inputs))
+
+    def run(self):
+        """Compute the newest queued quote until stopped"""
+        while True:
+            request = self.requests.get()
+            try:
+                while request is not None:
+                    request = self.requests.get_nowait()
+            except queue.Empty:
+                pass
+            if request is None:
+                return
+            generation, rateTable, inputs = request
+            try:
+                result = self.compute(rateTable, inputs)
+            except Exception as err:    # reported on the main thread instead of killing the worker
+                result = err
+            self.results.put((generation, result))
+
+    def stop(self):
+        """Stop the worker once it finishes the quote in hand"""
+        self.requests.put(None)
+
+
+class SweepWindow(tk.Toplevel):
+    """A scrollable table of a quantity break sweep
+
+    Only the rows in view are drawn on the canvas and they are redrawn on every scroll, so the table stays responsive
+    however many quantities the sweep holds.
+    """
+
+    def __init__(self, master, title, quantities, costs, perUnit):
+        super().__init__(master)
+        self.title(title)
+        self.geometry('460x600')
+        self.quantities = quantities
+        self.costs = costs
+        self.perUnit = perUnit
+        self.rows = len(quantities)
+        self.first = 0    # index of the top row in view
+
+        tk.Label(self, text = title, font = ('calibri', 12)).place(x = 10, y = 5)
+        for text, x in (('Quantity', 120), ('Cost', 270), ('Cost per unit', 420)):
+            tk.Label(self, text = text, font = ('calibri', 10, 'bold')).place(x = x, y = 35, anchor = 'ne')
+        self.canvas = tk.Canvas(self, width = 430, height = 480, bg = 'white', highlightthickness = 0)
+        self.canvas.place(x = 0, y = 60)
+        self.scrollbar = tk.Scrollbar(self, orient = 'vertical', command = self.scroll)
+        self.scrollbar.place(x = 435, y = 60, height = 480)
+        self.exportButton = tk.Button(self, text = 'Export CSV', command = self.export, cursor = 'hand2')
+        self.exportButton.place(x = 180, y = 555, height = 30, width = 100)
+
+        for widget in (self, self.canvas):
+            widget.bind('<MouseWheel>', lambda event: self.scroll('scroll', -event.delta // 120, 'units'))
+            widget.bind('<Button-4>', lambda event: self.scroll('scroll', -3, 'units'))
+            widget.bind('<Button-5>', lambda event: self.scroll('scroll', 3, 'units'))
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+        self.redraw()
+
+    def visible_rows(self):
+        """Return how many rows fit in the canvas"""
+        return max(1, int(self.canvas.cget('height')) // SWEEP_ROW_HEIGHT)
+
+    def scroll(self, action, amount, what = 'units'):
+        """Scrollbar and mouse wheel handler - 'moveto' a fraction or 'scroll' a number of units or pages"""
+        visible = self.visible_rows()
+        if action == 'moveto':
+            first = int(float(amount) * self.rows)
+        else:
+            first = self.first + int(amount) * (visible if what == 'pages' else 1)
+        self.first = max(0, min(first, self.rows - visible))
+        self.redraw()
+
+    def redraw(self):
+        """Draw the rows currently in view"""
+        visible = self.visible_rows()
+        self.canvas.delete('all')
+        for offset, i in enumerate(range(self.first, min(self.first + visible, self.rows))):
+            y = offset * SWEEP_ROW_HEIGHT + SWEEP_ROW_HEIGHT // 2
+            if i % 2:
+                self.canvas.create_rectangle(0, y - SWEEP_ROW_HEIGHT // 2, 430, y + SWEEP_ROW_HEIGHT // 2,
+                                             fill = '#f2f2f2', outline = '')
+            self.canvas.create_text(120, y, text = '{:,}'.format(int(self.quantities[i])), anchor = 'e')
+            self.canvas.create_text(270, y, text = '${:,.2f}'.format(self.costs[i]), anchor = 'e')
+            self.canvas.create_text(420, y, text = '${:,.4f}'.format(self.perUnit[i]), anchor = 'e')
+        if self.rows:
+            self.scrollbar.set(self.first / self.rows, min(1.0, (self.first + visible) / self.rows))
+
+    def export(self):
+        """Save the whole sweep as a CSV file"""
+        import dhlQuoteCurve
+
+        path = filedialog.asksaveasfilename(parent = self, defaultextension = '.csv',
+                                            filetypes = [('CSV files', '*.csv')])
+        if path:
+            with open(path, 'w', newline = '') as fh:
+                dhlQuoteCurve.write_sweep(fh, self.quantities, self.costs, self.perUnit)
+
+
+class Application(tk.Frame):
+    def __init__(self, master = None, startupTimer = None, history = None, ratesPath = None):
+        super().__init__(master)
+        self.master = master
+        self.startupTimer = startupTimer
+        self.ratesPath = ratesPath    # rate workbook given on the command line, else the user's or the bundled one
+        self.history = history    # QuoteHistory every calculated quote is logged to, if any
+        self.previousQuote = None    # (quoted_at, cost) of the same Entire Shipment quote from the history
+
+        # Indexed DHL rate table shared with the headless quoting engine, swapped by rateWatcher on a new rate sheet
+        self.rateTable = None
+        self.rateWatcher = None
+        self.rateLoader = None    # worker thread loading the rates at startup
+        self.loadedRates = None    # result handed over by rateLoader, picked up on the main thread
+        self.loadError = None
+
+        self.countries = set(dhlQuoteEngine.COUNTRY_COLUMNS)
+        self.country = 'China'    # The country chosen by the user to generate a landed freight quote from
+        self.countryChoices = None
+        self.countryMenu = None
+
+        # Method is the basis the user decides to quote by - weight per piece, weight of entire shipment, the most
+        # that can be shipped for a budget, a sweep of every quantity break or the cheapest split into parcels
+        self.methods = {'Per Piece', 'Entire Shipment', 'Max For Budget', 'Quantity Sweep', 'Split Shipment'}
+        self.method = 'Per Piece'    # default to calculate freight on per piece basis
+        self.methodChoices = None
+        self.methodMenu = None
+
+        self.pieceWeightEntry = None  # entry box for weight of 1 piece
+        self.pieceWeight = tk.StringVar()
+        self.qty1 = tk.StringVar()
+        self.qtyEntry1 = None
+        self.qty2 = tk.StringVar()
+        self.qtyEntry2 = None
+        self.qty3 = tk.StringVar()
+        self.qtyEntry3 = None
+        self.qty4 = tk.StringVar()
+        self.qtyEntry4 = None
+        self.qty5 = tk.StringVar()
+        self.qtyEntry5 = None
+
+        self.grossWeight = tk.StringVar()    # gross weight of entire shipment
+        self.grossWeightEntry = None    # entry box for weight of entire shipment
+
+        # Live quoting - traced inputs are debounced, quoted on liveQuoter and results older than liveGeneration are
+        # dropped when they arrive
+        self.liveQuotes = tk.BooleanVar(value = False)
+        self.liveCheck = None
+        self.liveQuoter = None
+        self.liveGeneration = 0
+        self.liveSubmitted = 0    # generation of the newest request handed to liveQuoter
+        self.liveAfter = None    # pending debounce after() id
+        self.livePolling = False
+        for var in (self.pieceWeight, self.qty1, self.qty2, self.qty3, self.qty4, self.qty5, self.grossWeight,
+                    self.liveQuotes):
+            var.trace('w', self.schedule_live_quote)
+
+        self.budget = tk.StringVar()    # most the user wants to spend when quoting by budget
+        self.budgetEntry = None
+        self.quoteCurves = {}    # QuoteCurve per country, built on demand from curveRates
+        self.curveRates = None    # the rate table quoteCurves were built from
+
+        self.sweepLimit = tk.StringVar(value = '100000')    # largest quantity of a quantity break sweep
+        self.sweepLimitEntry = None
+        self.sweepWindow = None
+        self.sweepRows = 0    # number of quantities in the last sweep
+
+        self.splitOptimizers = {}    # SplitOptimizer per country, built on demand from the quote curves
+        self.shipmentSplit = None    # the cheapest split of the last Split Shipment report
+        self.splitter = None    # LiveQuoter running the splits, so a heavy one never blocks the window
+        self.splitGeneration = 0    # generation of the newest split handed to splitter, older results are dropped
+        self.splitPolling = False
+
+        self.headerFrame = None
+        self.headerLabel = None
+        self.instructionFrame = None
+        self.instructionLabel = None
+        self.countryFrame = None
+        self.weightFrame = None
+        self.footerFrame = None
+
+        self.rateLabel1 = None    # Always a text label saying 'The cost of this shipment is estimated at:'
+        self.rateLabel2 = None
+        self.rateLabel3 = None
+        self.rateLabel4 = None
+        self.rateLabel5 = None
+        self.rateLabel6 = None
+
+        # Buttons
+        self.calculateButton = None
+        self.clearButton = None
+        self.quitButton = None
+
+        # Quoted values - only kept for display_rates, the quote itself is computed by dhlQuoteEngine
+        self.quotedWeight = 0    # final weight when quoting by entire shipment
+        self.budgetQuantity = None    # most pieces that fit the budget, None without a piece weight
+        self.budgetWeight = None    # heaviest gross weight that fits the budget, None if nothing does
+        self.freight_cost_final = []  # final weight when quoting by individual quantities
+
+        # Initializing functions
+        self.pack()
+        self.create_widgets()
+        self.initialize_rates()
+
+    def create_widgets(self):
+        """Creates all widgets"""
+        # create the Header Frame
+        self.headerFrame = tk.Frame(self.master, width = 600, height = 50, bd = 1, highlightbackground = 'black',
+                                    highlightcolor = 'black', highlightthickness = 0)
+        self.headerFrame.place(x = 0, y = 0)
+        self.headerFrame.pack_propagate(False)
+        self.headerLabel = tk.Label(self.headerFrame, text = 'DHL Freight Calculator', fg = 'red',
+                                    font = ('calibri', 16))
+        self.headerLabel.place(x = 300, y = 37.5, anchor = 'center')
+
+        # Create an instruction box underneath the header
+        self.instructionFrame = tk.Frame(self.master, width = 600, height = 150, bd = 0, highlightbackground = 'black',
+                                         highlightcolor = 'black', highlightthickness = 0)
+        self.instructionFrame.place(x=0, y=50)
+        self.instructionFrame.pack_propagate(False)
+        self.instructionLabel = tk.Label(self.instructionFrame, text = 'This is a comprehensive freight quote '
+                                                                       'generator that uses our custom DHL rates to '
+                                                                       'generate a freight quote based on multiple '
+                                                                       'quantities and country of origin. Please '
+                                                                       'select a country from the drop down menu, '
+                                                                       'enter the quantities you would like to quote, '
+                                                                       'and the weight of 1 piece to generate a quote. '
+                                                                       'Alternatively, if you know the weight of the '
+                                                                       'entire shipment, please select that option '
+                                                                       'and enter the gross weight to generate your '
+                                                                       'quote.',
+                                         height = 125, wraplength = 450, justify = 'center', font = ('calibri', 10))
+        self.instructionLabel.place(x = 300, y = 75, anchor = 'center')
+
+        # Create Frame where user is able to select country and method
+        self.countryFrame = tk.Frame(self.master, width = 600, height = 50, bd = 1, highlightbackground = 'black',
+                                     highlightcolor = 'black', highlightthickness = 0)
+        self.countryFrame.place(x = 0, y = 200)
+
+        # TODO: change menu and choices for country and method from grid to place
+        # Create a drop down for users to choose which country they are exporting from
+        self.countryChoices = tk.StringVar(self.master)
+        self.countryChoices.set('China')
+        self.countryMenu = tk.OptionMenu(self.countryFrame, self.countryChoices, *self.countries)
+        tk.Label(self.countryFrame, text = 'Select a Country:').grid(row = 1, column = 1, padx = 20)
+        self.countryMenu.grid(row = 1, column = 2)
+        self.countryChoices.trace('w', self.change_country_dropdown)
+
+        # Create a drop down for users to choose whether they are quoting weight per piece or entire shipment
+        self.methodChoices = tk.StringVar(self.master)
+        self.methodChoices.set('Per Piece')
+        self.methodMenu = tk.OptionMenu(self.countryFrame, self.methodChoices, *self.methods)
+        tk.Label(self.countryFrame, text = 'How are you calculating freight:').grid(row = 1, column = 3, padx = 20)
+        self.methodMenu.grid(row = 1, column = 4)
+        self.methodChoices.trace('w', self.change_method_dropdown)
+
+        # Initialize weight frame
+        self.set_weight_frame()
+
+        # Create Footer Frame
+        self.footerFrame = tk.Frame(self.master, width = 600, height = 50, bd = 1, highlightbackground = 'black',
+                                    highlightcolor = 'black', highlightthickness = 0)
+        self.footerFrame.place(x = 0, y = 700)
+
+        # Create calculate button using generate_report script
+        self.calculateButton = tk.Button(self.footerFrame, text = 'Loading rates...', command = self.generate_report,
+                                         cursor = 'hand2', state = 'disabled')    # enabled once the rates load
+        self.calculateButton.place(x = 225, y = 10, height = 30, width = 150)
+
+        # Create a 'clear fields' button that wipes the form clean and allows users to run another quote
+        self.clearButton = tk.Button(self.footerFrame, text = 'Clear Fields', command = self.clear_fields,
+                                     cursor = 'hand2')
+        self.clearButton.place(x = 25, y = 10, height = 30, width = 75)
+
+        # Create a check box to quote as the user types instead of waiting for Calculate
+        self.liveCheck = tk.Checkbutton(self.footerFrame, text = 'Update as you type', variable = self.liveQuotes,
+                                        cursor = 'hand2')
+        self.liveCheck.place(x = 105, y = 14)
+
+        # Create a quit button
+        self.quitButton = tk.Button(self.footerFrame, text = 'Quit', command = self.quit_application, cursor = 'hand2')
+        self.quitButton.place(x = 500, y = 10, height = 30, width = 75)
+
+        # TODO: Create label with program & copyright info
+
+    def initialize_rates(self):
+        """Initialize freight rates from DHL excel workbook on a worker thread so the window can paint immediately"""
+        self.rateLoader = threading.Thread(target = self.load_rates, name = 'RateLoader', daemon = True)
+        self.rateLoader.start()
+        self.after(LOAD_POLL_MS, self.check_rates_loaded)
+
+    def load_rates(self):
+        """Load the rate table - runs on the rateLoader thread, so no widgets are touched here"""
+        start = time.perf_counter()
+        try:
+            self.loadedRates = dhlRateCache.load_rate_table(self.ratesPath)
+        except Exception as err:
+            self.loadError = err
+        if self.startupTimer is not None:
+            source = 'parsed workbook' if 'openpyxl' in sys.modules else 'from snapshot'
+            self.startupTimer.mark('rates loaded', '({:.1f} ms on worker thread, {})'.format(
+                (time.perf_counter() - start) * 1000, source))
+
+    def check_rates_loaded(self):
+        """Poll the rate loader from the mainloop and enable the Calculate button once the rates are in"""
+        if self.rateLoader.is_alive():
+            self.after(LOAD_POLL_MS, self.check_rates_loaded)
+            return
+        if self.loadError is not None:
+            self.calculateButton.config(text = 'Rates unavailable')
+            messagebox.showerror('DHL Freight Calculator', 'Could not load the DHL rates:\n{}'.format(self.loadError))
+            return
+
+        self.rateTable = self.loadedRates
+        self.rateWatcher = dhlRateWatcher.RateWatcher(self.rateTable, self.ratesPath, onReload = self.set_rate_table)
+        self.rateWatcher.start()
+        self.calculateButton.config(text = 'Calculate', state = 'normal')
+        self.report_startup()
+
+    def report_startup(self):
+        """Print the startup timing report once the window has painted and the rates have loaded"""
+        if self.startupTimer is not None and self.startupTimer.done('first paint', 'rates loaded'):
+            print(self.startupTimer.report())
+            self.startupTimer = None
+
+    def set_rate_table(self, rateTable):
+        """Quote from a newly loaded rate table - called from the watcher thread, so no widgets are touched here"""
+        self.rateTable = rateTable
+
+    def change_country_dropdown(self, *args):
+        """Sets the country variable when users select a different country from the dropdown menu"""
+        self.country = str(self.countryChoices.get())
+        self.schedule_live_quote()
+
+    def change_method_dropdown(self, *args):
+        """Change the dropdown menu for quote method - calls set_weight_frame"""
+        self.clear_fields()
+        self.method = str(self.methodChoices.get())
+        self.cancel_live_quote()    # clearing the fields scheduled one under the old method
+        self.weightFrame.destroy()
+
+        # reset weight frame
+        self.set_weight_frame()
+
+    def set_weight_frame(self):
+        """Set the weight frame that allows users to input quantities and weights, refreshes based on method"""
+        self.weightFrame = tk.Frame(self.master, width = 600, height = 450, bd = 1, highlightbackground = 'black',
+                                    highlightcolor = 'black', highlightthickness = 0)
+        self.weightFrame.place(x = 0, y = 250)
+        if self.method == 'Per Piece':
+            tk.Label(self.weightFrame, text = 'Weight of 1 piece in grams (g):').place(x = 150, y = 15)
+            self.pieceWeightEntry = tk.Entry(self.weightFrame, textvariable = self.pieceWeight)
+            self.pieceWeightEntry.place(x = 325, y = 15)
+            tk.Label(self.weightFrame, text = "Quantity 1:").place(x = 75, y= 75)
+            tk.Label(self.weightFrame, text = "Quantity 2:").place(x = 75, y = 125)
+            tk.Label(self.weightFrame, text = "Quantity 3:").place(x = 75, y = 175)
+            tk.Label(self.weightFrame, text = "Quantity 4:").place(x = 75, y = 225)
+            tk.Label(self.weightFrame, text = "Quantity 5:").place(x = 75, y = 275)
+            self.qtyEntry1 = tk.Entry(self.weightFrame, textvariable = self.qty1)
+            self.qtyEntry2 = tk.Entry(self.weightFrame, textvariable = self.qty2)
+            self.qtyEntry3 = tk.Entry(self.weightFrame, textvariable = self.qty3)
+            self.qtyEntry4 = tk.Entry(self.weightFrame, textvariable = self.qty4)
+            self.qtyEntry5 = tk.Entry(self.weightFrame, textvariable = self.qty5)
+            self.qtyEntry1.place(x = 150, y = 75)
+            self.qtyEntry2.place(x = 150, y = 125)
+            self.qtyEntry3.place(x = 150, y = 175)
+            self.qtyEntry4.place(x = 150, y = 225)
+            self.qtyEntry5.place(x = 150, y = 275)
+
+        elif self.method == 'Max For Budget':
+            tk.Label(self.weightFrame, text = 'Weight of 1 piece in grams (g):').place(x = 150, y = 15)
+            self.pieceWeightEntry = tk.Entry(self.weightFrame, textvariable = self.pieceWeight)
+            self.pieceWeightEntry.place(x = 325, y = 15)
+            tk.Label(self.weightFrame, text = 'Budget in US dollars ($):').place(x = 150, y = 55)
+            self.budgetEntry = tk.Entry(self.weightFrame, textvariable = self.budget)
+            self.budgetEntry.place(x = 325, y = 55)
+
+        elif self.method == 'Quantity Sweep':
+            tk.Label(self.weightFrame, text = 'Weight of 1 piece in grams (g):').place(x = 150, y = 15)
+            self.pieceWeightEntry = tk.Entry(self.weightFrame, textvariable = self.pieceWeight)
+            self.pieceWeightEntry.place(x = 325, y = 15)
+            tk.Label(self.weightFrame, text = 'Quote every quantity up to:').place(x = 150, y = 55)
+            self.sweepLimitEntry = tk.Entry(self.weightFrame, textvariable = self.sweepLimit)
+            self.sweepLimitEntry.place(x = 325, y = 55)
+
+        elif self.method == 'Split Shipment':
+            tk.Label(self.weightFrame, text = 'Gross Weight of Shipment in Kilograms (kg):').place(x = 75, y = 15)
+            self.grossWeightEntry = tk.Entry(self.weightFrame, textvariable = self.grossWeight)
+            self.grossWeightEntry.place(x = 325, y = 15)
+            tk.Label(self.weightFrame, text = 'or weight of 1 piece in grams (g):').place(x = 75, y = 55)
+            self.pieceWeightEntry = tk.Entry(self.weightFrame, textvariable = self.pieceWeight)
+            self.pieceWeightEntry.place(x = 325, y = 55)
+            tk.Label(self.weightFrame, text = 'and quantity:').place(x = 75, y = 85)
+            self.qtyEntry1 = tk.Entry(self.weightFrame, textvariable = self.qty1)
+            self.qtyEntry1.place(x = 325, y = 85)
+
+        else:
+            # Create a box for user to enter weight entire shipment
+            tk.Label(self.weightFrame, text = 'Gross Weight of Shipment in Kilograms (kg):').place(x = 75, y = 15)
+            # self.grossWeight = tk.StringVar()
+            self.grossWeightEntry = tk.Entry(self.weightFrame, textvariable = self.grossWeight)
+            self.grossWeightEntry.place(x = 325, y = 15)
+            # TODO: Bind the entry field to the enter key, so when the user hits enter it runs the script
+            # self.grossWeightEntry.bind('<Return>', self.calculateButton.invoke())
+
+    def generate_report(self):
+        """Grab the weight and quantity value and generate a value or list of values determined by method"""
+        rateTable = self.rateTable    # one version of the rates for the whole report, even if a reload lands now
+        if self.method in LIVE_METHODS:
+            inputs = self.read_inputs()
+            result = self.compute_quote(rateTable, inputs)
+            self.apply_quote(result)
+            self.record_quote(rateTable, inputs, result)
+        elif self.method == 'Max For Budget':
+            curve = self.quote_curve(rateTable)
+            pieceWeight = self.read_float(self.pieceWeight)
+            budget = self.read_float(self.budget)
+            try:
+                self.budgetWeight = curve.max_weight(budget)
+                self.budgetQuantity = curve.max_quantity(pieceWeight, budget) if pieceWeight > 0 else None
+            except ValueError as err:    # a budget or piece weight out of range
+                messagebox.showerror('DHL Freight Calculator', 'Could not quote the budget:\n{}'.format(err))
+                self.budgetWeight = self.budgetQuantity = None
+        elif self.method == 'Quantity Sweep':
+            self.open_sweep(rateTable)
+        elif self.method == 'Split Shipment':
+            self.start_split(rateTable)
+        self.display_rates()
+
+    def read_inputs(self):
+        """Read the method, country and weight inputs - main thread only, as it reads Tk variables"""
+        quantities = (self.read_float(self.qty1), self.read_float(self.qty2), self.read_float(self.qty3),
+                      self.read_float(self.qty4), self.read_float(self.qty5))
+        return (self.method, self.country, self.read_float(self.pieceWeight), quantities,
+                self.read_float(self.grossWeight))
+
+    @staticmethod
+    def compute_quote(rateTable, inputs):
+        """Quote a snapshot of the inputs - touches no widgets, so it is safe on any thread"""
+        method, country, pieceWeight, quantities, grossWeight = inputs
+        if method == 'Per Piece':
+            return dhlQuoteEngine.quote_per_piece(rateTable, pieceWeight, quantities, country)
+        return dhlQuoteEngine.quote_shipment(rateTable, grossWeight, country)
+
+    def apply_quote(self, result):
+        """Keep a computed quote for display_rates"""
+        self.previousQuote = None
+        if self.method == 'Per Piece':
+            self.freight_cost_final = result
+        else:
+            self.quotedWeight = result
+
+    def record_quote(self, rateTable, inputs, result):
+        """Log a calculated quote to the history, looking up when the same shipment was last quoted"""
+        if self.history is None:
+            return
+        method, country, pieceWeight, quantities, grossWeight = inputs
+        if method == 'Per Piece':
+            for quantity, cost in zip(quantities, result):
+                if quantity > 0:
+                    self.history.record(rateTable, country, method, quantity * pieceWeight / 1000, cost,
+                                        pieceWeight, quantity)
+        elif grossWeight > 0:
+            self.previousQuote = self.history.find_same(rateTable, country, method, grossWeight)
+            self.history.record(rateTable, country, method, grossWeight, result)
+
+    def cancel_live_quote(self):
+        """Drop the pending live quote and mark anything already in flight as stale"""
+        self.liveGeneration += 1
+        if self.liveAfter is not None:
+            self.after_cancel(self.liveAfter)
+            self.liveAfter = None
+
+    def schedule_live_quote(self, *args):
+        """Trace callback - (re)start the debounce timer for a live quote"""
+        self.cancel_live_quote()
+        if self.liveQuotes.get() and self.method in LIVE_METHODS and self.rateTable is not None:
+            self.liveAfter = self.after(LIVE_DEBOUNCE_MS, self.start_live_quote)
+
+    def start_live_quote(self):
+        """Hand the current inputs to the live quote worker and start polling for its result"""
+        self.liveAfter = None
+        if not (self.liveQuotes.get() and self.method in LIVE_METHODS):    # switched away while debouncing
+            return
+        if self.liveQuoter is None:
+            self.liveQuoter = LiveQuoter()
+            self.liveQuoter.start()
+        self.liveSubmitted = self.liveGeneration
+        self.liveQuoter.submit(self.liveGeneration, self.rateTable, self.read_inputs())
+        if not self.livePolling:
+            self.livePolling = True
+            self.after(LIVE_POLL_MS, self.check_live_results)
+
+    def check_live_results(self):
+        """Poll the live quote worker until it has answered the newest request"""
+        finished = True    # if showing a result fails, stop so the next live quote starts polling afresh
+        try:
+            finished = self.show_live_results()
+        finally:
+            if finished:
+                self.livePolling = False
+            else:
+                self.after(LIVE_POLL_MS, self.check_live_results)
+
+    def show_live_results(self):
+        """Show the newest live quote the worker has, dropping any result the user has typed past
+
+        Returns True once the newest request has been answered.
+        """
+        finished = False
+        try:
+            while True:
+                generation, result = self.liveQuoter.results.get_nowait()
+                finished = finished or generation == self.liveSubmitted    # the worker always reaches the newest
+                if (generation == self.liveGeneration and self.method in LIVE_METHODS
+                        and not isinstance(result, Exception)):
+                    self.apply_quote(result)
+                    self.display_rates()
+        except queue.Empty:
+            pass
+        return finished
+
+    def start_split(self, rateTable):
+        """Hand the shipment to the split worker and start polling for its cheapest split"""
+        if self.splitter is None:
+            self.splitter = LiveQuoter(self.compute_split, 'ShipmentSplitter')
+            self.splitter.start()
+        self.splitGeneration += 1
+        self.shipmentSplit = None
+        self.splitter.submit(self.splitGeneration, self.split_optimizer(rateTable),
+                             (self.read_float(self.grossWeight), self.read_float(self.pieceWeight),
+                              self.read_float(self.qty1)))
+        if not self.splitPolling:
+            self.splitPolling = True
+            self.after(LIVE_POLL_MS, self.check_split_results)
+
+    @staticmethod
+    def compute_split(optimizer, inputs):
+        """Split a snapshot of the inputs - by gross weight if one is given, else by piece - on the worker thread"""
+        grossWeight, pieceWeight, quantity = inputs
+        if grossWeight:
+            return optimizer.split_weight(grossWeight)
+        return optimizer.split_pieces(pieceWeight, quantity)
+
+    def check_split_results(self):
+        """Poll the split worker until it has answered the newest split, then show it"""
+        result = None
+        try:
+            while True:
+                generation, result = self.splitter.results.get_nowait()
+                if generation == self.splitGeneration:
+                    break
+        except queue.Empty:
+            self.after(LIVE_POLL_MS, self.check_split_results)
+            return
+        self.splitPolling = False
+        if isinstance(result, Exception):    # out of range or not a number - the worker carries on
+            messagebox.showerror('DHL Freight Calculator', 'Could not split the shipment:\n{}'.format(result))
+        elif self.method == 'Split Shipment':
+            self.shipmentSplit = result
+            self.display_rates()
+
+    def open_sweep(self, rateTable):
+        """Quote every quantity up to the sweep limit, at most SWEEP_QUANTITY, and show them in a quantity break
+        window"""
+        import dhlQuoteCurve
+
+        pieceWeight = self.read_float(self.pieceWeight)
+        limit = self.read_float(self.sweepLimit)
+        if not (math.isfinite(pieceWeight) and math.isfinite(limit)):
+            messagebox.showerror('DHL Freight Calculator', 'The piece weight and sweep limit must be numbers')
+            self.sweepRows = 0
+            return
+        limit = int(min(limit, dhlQuoteCurve.SWEEP_QUANTITY))
+        if pieceWeight <= 0 or limit <= 0:
+            self.sweepRows = 0
+            return
+        quantities, costs, perUnit = self.quote_curve(rateTable).sweep(pieceWeight, limit)
+        self.sweepRows = len(quantities)
+        if self.sweepWindow is not None:
+            self.sweepWindow.destroy()
+        self.sweepWindow = SweepWindow(self.master, '{} - {:,g} g per piece'.format(self.country, pieceWeight),
+                                       quantities, costs, perUnit)
+
+    def quote_curve(self, rateTable):
+        """Return the quote curve of the selected country, rebuilding the curves when the rate table has changed"""
+        import dhlQuoteCurve
+
+        if self.curveRates is not rateTable:
+            self.quoteCurves = {}
+            self.curveRates = rateTable
+        if self.country not in self.quoteCurves:
+            dhlMetrics.count('quote_curve_cache', 'miss')
+            self.quoteCurves[self.country] = dhlQuoteCurve.QuoteCurve(rateTable, self.country)
+        else:
+            dhlMetrics.count('quote_curve_cache', 'hit')
+        return self.quoteCurves[self.country]
+
+    def split_optimizer(self, rateTable):
+        """Return the split optimizer of the selected country, sharing its quote curve"""
+        import dhlShipmentSplit
+
+        curve = self.quote_curve(rateTable)
+        optimizer = self.splitOptimizers.get(self.country)
+        if optimizer is None or optimizer.curve is not curve:
+            optimizer = self.splitOptimizers[self.country] = dhlShipmentSplit.SplitOptimizer(rateTable, self.country,
+                                                                                             curve)
+        return optimizer
+
+    @staticmethod
+    def read_float(var):
+        """Read a StringVar as a float, treating anything that is not a number as 0"""
+        try:
+            return float(var.get())
+        except ValueError:
+            return 0.0
+
+    def display_rates(self):
+        """Open a second tkinter window that displays the quoted rate calculated by the program"""
+        try:
+            self.rateLabel1.destroy()
+            self.rateLabel2.destroy()
+            self.rateLabel3.destroy()
+            self.rateLabel4.destroy()
+            self.rateLabel5.destroy()
+            self.rateLabel6.destroy()
+        except AttributeError:
+            pass
+
+        self.rateLabel1 = tk.Label(self.weightFrame, text = 'The costs of this shipment are estimated at:')
+
+        if self.method == 'Per Piece':
+            self.rateLabel2 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[0]),
+                                       fg = 'green', font = 14)
+            self.rateLabel3 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[1]),
+                                       fg = 'green', font = 14)
+            self.rateLabel4 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[2]),
+                                       fg = 'green', font = 14)
+            self.rateLabel5 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[3]),
+                                       fg = 'green', font = 14)
+            self.rateLabel6 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.freight_cost_final[4]),
+                                       fg = 'green', font = 14)
+
+            if self.freight_cost_final[0] > 0:
+                self.rateLabel2.place(x = 300, y = 70)
+            if self.freight_cost_final[1] > 0:
+                self.rateLabel3.place(x = 300, y = 120)
+            if self.freight_cost_final[2] > 0:
+                self.rateLabel4.place(x = 300, y = 170)
+            if self.freight_cost_final[3] > 0:
+                self.rateLabel5.place(x = 300, y = 220)
+            if self.freight_cost_final[4] > 0:
+                self.rateLabel6.place(x = 300, y = 270)
+        elif self.method == 'Max For Budget':
+            self.rateLabel1 = tk.Label(self.weightFrame, text = 'For this budget you can ship up to:')
+            curve = self.quoteCurves[self.country]
+            if self.budgetQuantity is not None:
+                self.rateLabel2 = tk.Label(self.weightFrame, text = '{:,} pieces (${:,.2f})'.format(
+                    self.budgetQuantity, curve.cost_quantity(self.read_float(self.pieceWeight), self.budgetQuantity)),
+                                           fg = 'green', font = 16)
+                self.rateLabel2.place(x = 300, y = 160, anchor = 'center')
+            if self.budgetWeight is not None:
+                self.rateLabel3 = tk.Label(self.weightFrame, text = '{:,.1f} kg gross weight (${:,.2f})'.format(
+                    self.budgetWeight, curve.cost(self.budgetWeight)), fg = 'green', font = 16)
+                self.rateLabel3.place(x = 300, y = 190, anchor = 'center')
+                self.rateLabel1.place(x = 300, y = 130, anchor = 'center')
+        elif self.method == 'Quantity Sweep':
+            if self.sweepRows:
+                self.rateLabel1 = tk.Label(self.weightFrame, text = 'Quoted {:,} quantities - see the quantity break '
+                                                                    'window'.format(self.sweepRows))
+                self.rateLabel1.place(x = 300, y = 130, anchor = 'center')
+        elif self.method == 'Split Shipment':
+            split = self.shipmentSplit
+            if split is not None and split.parcels:
+                self.rateLabel1 = tk.Label(self.weightFrame, text = 'The cheapest split is {:,} parcels:'.format(
+                    len(split.parcels)))
+                groups = split.groups()
+                lines = ['{:,} x {:,g} kg at ${:,.2f}'.format(count, weight, cost)
+                         for count, weight, cost in groups[:6]]
+                if len(groups) > 6:
+                    lines.append('and {:,} more parcels'.format(sum(count for count, weight, cost in groups[6:])))
+                self.rateLabel2 = tk.Label(self.weightFrame, text = '\n'.join(lines))
+                self.rateLabel3 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(split.cost), fg = 'green',
+                                           font = 16)
+                self.rateLabel4 = tk.Label(self.weightFrame, text = 'Saves ${:,.2f} on one shipment at ${:,.2f}'.format(
+                    split.savings, split.unsplitCost))
+                self.rateLabel1.place(x = 300, y = 130, anchor = 'center')
+                self.rateLabel2.place(x = 300, y = 150, anchor = 'n')
+                self.rateLabel3.place(x = 300, y = 290, anchor = 'center')
+                self.rateLabel4.place(x = 300, y = 315, anchor = 'center')
+        else:
+            self.rateLabel2 = tk.Label(self.weightFrame, text = '${:,.2f}'.format(self.quotedWeight),
+                                       fg = 'green', font = 16)
+            if self.quotedWeight > 0:
+                self.rateLabel1.place(x = 300, y = 100, anchor = 'center')
+                self.rateLabel2.place(x = 300, y = 130, anchor = 'center')
+            if self.previousQuote is not None:
+                self.rateLabel3 = tk.Label(self.weightFrame, text = 'Same as your quote of {}'.format(
+                    time.strftime('%Y-%m-%d %H:%M', time.localtime(self.previousQuote[0]))))
+                self.rateLabel3.place(x = 300, y = 160, anchor = 'center')
+
+    def clear_fields(self):
+        """Clear all fields in the weightFrame"""
+        try:
+            if self.method == 'Per Piece':
+                self.pieceWeightEntry.delete(0, 'end')
+                self.qtyEntry1.delete(0, 'end')
+                self.qtyEntry2.delete(0, 'end')
+                self.qtyEntry3.delete(0, 'end')
+                self.qtyEntry4.delete(0, 'end')
+                self.qtyEntry5.delete(0, 'end')
+                self.rateLabel1.destroy()
+                self.rateLabel2.destroy()
+                self.rateLabel3.destroy()
+                self.rateLabel4.destroy()
+                self.rateLabel5.destroy()
+                self.rateLabel6.destroy()
+            elif self.method == 'Max For Budget':
+                self.pieceWeightEntry.delete(0, 'end')
+                self.budgetEntry.delete(0, 'end')
+                self.rateLabel1.destroy()
+                self.rateLabel2.destroy()
+                self.rateLabel3.destroy()
+            elif self.method == 'Quantity Sweep':
+                self.pieceWeightEntry.delete(0, 'end')
+                self.rateLabel1.destroy()
+            elif self.method == 'Split Shipment':
+                self.grossWeightEntry.delete(0, 'end')
+                self.pieceWeightEntry.delete(0, 'end')
+                self.qtyEntry1.delete(0, 'end')
+                self.rateLabel1.destroy()
+                self.rateLabel2.destroy()
+                self.rateLabel3.destroy()
+                self.rateLabel4.destroy()
+            else:
+                self.grossWeightEntry.delete(0, 'end')
+                self.rateLabel1.destroy()
+                self.rateLabel2.destroy()
+                self.rateLabel3.destroy()
+        except AttributeError:
+            pass
+
+    def quit_application(self):
+        """Quit the application"""
+        if self.rateWatcher is not None:
+            self.rateWatcher.stop()
+        if self.liveQuoter is not None:
+            self.liveQuoter.stop()
+        if self.splitter is not None:
+            self.splitter.stop()
+        if self.history is not None:
+            self.history.close()
+        self.master.destroy()
+
+
+dhlMetrics.instrument(Application, 'generate_report', 'generate_report')
+dhlMetrics.instrument(Application, 'display_rates', 'display_rates')
+
+
+def run_gui(startupTiming = False, historyPath = None, keepHistory = True, ratesPath = None):
+    """Open the calculator window, printing a startup timing report if startupTiming is set
+
+    Quotes are logged to the history database at historyPath (the per user default if None) unless keepHistory is
+    False.
+    """
+    history = None
+    if keepHistory:
+        import dhlQuoteHistory
+        history = dhlQuoteHistory.QuoteHistory(historyPath)
+    startupTimer = None
+    if startupTiming:
+        startupTimer = StartupTimer(_launchTime)
+        startupTimer.mark('imports')
+    calcApp = tk.Tk()
+    calcApp.title('DHL Freight Calculator')
+    calcApp.geometry('600x750')
+    calcApp.resizable(0, 0)
+    app = Application(master = calcApp, startupTimer = startupTimer, history = history, ratesPath = ratesPath)
+    if startupTimer is not None:
+        startupTimer.mark('window created')
+
+        def painted():
+            startupTimer.mark('first paint')
+            app.report_startup()
+
+        def mapped(event):
+            if event.widget is calcApp:
+                calcApp.unbind('<Map>', mapBinding)
+                calcApp.after_idle(painted)    # redraws are idle tasks, queued ahead of this one
+
+        mapBinding = calcApp.bind('<Map>', mapped)
+    app.mainloop()
+
+
+def main(argv = None):
+    """Parse the command line and run the requested mode, the GUI when no mode is given"""
+    parser = argparse.ArgumentParser(description = 'DHL Freight Calculator')
+    parser.add_argument('--batch', metavar = 'FILE', nargs = '?', const = '-',
+                        help = 'quote a CSV or JSONL file of shipments instead of opening the window (- for stdin)')
+    parser.add_argument('--output', metavar = 'FILE', default = '-',
+                        help = 'where to write batch quotes (- for stdout)')
+    parser.add_argument('--format', choices = ('csv', 'jsonl'),
+                        help = 'batch file format, defaults to the input extension or csv')
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'batch worker processes, 0 for one per CPU (default 1)')
+    parser.add_argument('--split', action = 'store_true',
+                        help = 'price each batch shipment as its cheapest split into parcels, listing the parcels')
+    parser.add_argument('--columnar', action = 'store_true',
+                        help = 'write batch quotes to --output as a memory-mappable columnar binary file')
+    parser.add_argument('--rate-diff', nargs = 2, metavar = ('OLD', 'NEW'),
+                        help = 'compare two rate workbooks and write a CSV report of the logged quotes they re-price '
+                               'to --output')
+    parser.add_argument('--rates', metavar = 'FILE',
+                        help = 'rate workbook to quote from and watch for changes, defaults to $DHL_RATES_FILE or '
+                               'dhlRates.xlsx next to the program')
+    parser.add_argument('--sheet', metavar = 'NAME',
+                        help = 'quote a batch from the rate card on another sheet of the rate workbook, taking zone '
+                               'names such as "Zone G" as well as countries')
+    parser.add_argument('--serve', action = 'store_true', help = 'run the HTTP quote service instead of the window')
+    parser.add_argument('--host', help = 'address the quote service listens on, defaults to 127.0.0.1')
+    parser.add_argument('--port', type = int, help = 'port the quote service listens on, defaults to 8750')
+    parser.add_argument('--history', metavar = 'FILE',
+                        help = 'SQLite file the window logs quotes to, defaults to quoteHistory.sqlite3 in the rate '
+                               'snapshot directory')
+    parser.add_argument('--no-history', action = 'store_true', help = 'do not log quotes made in the window')
+    parser.add_argument('--startup-timing', action = 'store_true',
+                        help = 'print how long imports, rate loading and the first paint of the window took')
+    parser.add_argument('--metrics', metavar = 'FILE',
+                        help = 'record per stage timings and counters and write them to FILE on exit - Prometheus '
+                               'text for .prom/.txt, JSON otherwise (batch --workers only records the parent process)')
+    args = parser.parse_args(argv)
+    if args.rates and not os.path.isfile(args.rates):
+        parser.error('no rate workbook at {}'.format(args.rates))
+    if args.sheet and args.batch is None:
+        parser.error('--sheet only applies to --batch')
+
+    if args.metrics:
+        dhlMetrics.enable()
+    try:
+        run_mode(parser, args)
+    finally:
+        if args.metrics:
+            dhlMetrics.write(args.metrics)
+
+
+def run_mode(parser, args):
+    """Run the mode selected on the command line"""
+    if args.batch is not None:
+        import dhlBatchCli
+        try:
+            rateTable = batch_rates(parser, args)
+            dhlBatchCli.run_batch(rateTable, args.batch, args.output, args.format, args.workers, args.split,
+                                  args.columnar)
+        except dhlBatchCli.BatchError as err:
+            parser.exit(1, 'error: {}\n'.format(err))
+        except BrokenPipeError:    # downstream of a shell pipe closed early, e.g. | head
+            sys.stderr.close()
+        return
+    if args.rate_diff:
+        import dhlRateDiff
+        dhlRateDiff.run_rate_diff(args.rate_diff[0], args.rate_diff[1], args.history, args.output)
+        return
+    if args.serve:
+        import dhlQuoteServer
+        dhlQuoteServer.run_server(dhlRateCache.load_rate_table(args.rates), args.host or dhlQuoteServer.DEFAULT_HOST,
+                                  args.port or dhlQuoteServer.DEFAULT_PORT, args.rates)
+        return
+    run_gui(args.startup_timing, args.history, not args.no_history, args.rates)
+
+
+def batch_rates(parser, args):
+    """Return the rates a batch is quoted from - the rate card of --sheet if given, else the cached rate table"""
+    if not args.sheet:
+        return dhlRateCache.load_rate_table(args.rates)
+    import dhlRateCards
+
+    registry = dhlRateCards.RateCardRegistry()
+    registry.load_workbook(dhlQuoteEngine.rates_path(args.rates))
+    if not registry.versions(args.sheet):
+        parser.error('no rate card on sheet {!r}'.format(args.sheet))
+    return registry.get(args.sheet)
+
+
+if __name__ == '__main__':
+    if getattr(sys, 'frozen', False):    # in the PyInstaller exe, --workers processes start here, not in main()
+        import multiprocessing
+        multiprocessing.freeze_support()
+    main()
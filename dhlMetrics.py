@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""Opt-in timing and counters for the quoting pipeline, exported as Prometheus text or a JSON snapshot
+
+Nothing is measured until enable() is called. Stage timing works by swapping timed wrappers in for the instrumented
+functions (see instrument()) and disable() puts the originals back, so with metrics off the quoting code runs
+exactly as it would without this module. Counters recorded with count() are a single flag check when off and are
+only used on rare paths such as loading the rates.
+"""
+import bisect
+import functools
+import json
+import threading
+import time
+
+import dhlQuoteEngine
+
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, .1,
+           .25, .5, 1, 2.5, 5)    # histogram bucket upper bounds, in seconds
+
+enabled = False
+_lock = threading.Lock()
+_histograms = {}    # stage -> [bucket counts..., +Inf count], sum
+_counters = {}    # (name, label) -> count
+_instrumented = []    # (owner, attribute, stage, wrap) registered with instrument()
+_originals = {}    # (owner, attribute) -> the function replaced while enabled
+
+
+def observe(stage, seconds):
+    """Record how long one call of a stage took"""
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = [[0] * (len(BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+
+def count(name, label = '', amount = 1):
+    """Add to a counter, e.g. count('rate_snapshot', 'hit')"""
+    if enabled:
+        with _lock:
+            _counters[(name, label)] = _counters.get((name, label), 0) + amount
+
+
+def timed(stage, fn):
+    """Return fn wrapped to record its latency under stage"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            observe(stage, time.perf_counter() - start)
+    return wrapper
+
+
+def timed_cost(stage, fn):
+    """Return RateTable.cost wrapped to record its latency and whether it was a table lookup or a per kg band"""
+    @functools.wraps(fn)
+    def wrapper(self, weight, column):
+        wt = float(weight)
+        count('quotes', 'zero' if wt <= 0 else 'table' if wt <= self.tableLimit else 'band')
+        start = time.perf_counter()
+        try:
+            return fn(self, weight, column)
+        finally:
+            observe(stage, time.perf_counter() - start)
+    return wrapper
+
+
+def instrument(owner, attribute, stage, wrap = timed):
+    """Register a module or class function to be timed under stage while metrics are enabled"""
+    _instrumented.append((owner, attribute, stage, wrap))
+    if enabled:
+        _install(owner, attribute, stage, wrap)
+
+
+def _install(owner, attribute, stage, wrap):
+    if (owner, attribute) not in _originals:
+        original = getattr(owner, attribute)
+        _originals[(owner, attribute)] = original
+        setattr(owner, attribute, wrap(stage, original))
+
+
+def enable():
+    """Start recording metrics"""
+    global enabled
+    enabled = True
+    for owner, attribute, stage, wrap in _instrumented:
+        _install(owner, attribute, stage, wrap)
+
+
+def disable():
+    """Stop recording metrics and restore the uninstrumented functions, keeping what was recorded"""
+    global enabled
+    enabled = False
+    for (owner, attribute), original in _originals.items():
+        setattr(owner, attribute, original)
+    _originals.clear()
+
+
+def reset():
+    """Forget everything recorded so far"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def snapshot():
+    """Return everything recorded as a JSON serializable dict"""
+    with _lock:
+        stages = {}
+        for stage, (buckets, total) in sorted(_histograms.items()):
+            calls = sum(buckets)
+            stages[stage] = {
+                'count': calls,
+                'sum_seconds': total,
+                'mean_seconds': total / calls if calls else 0.0,
+                'buckets': {str(bound): n for bound, n in zip(BUCKETS + ('+Inf',), buckets)}
+            }
+        counters = {}
+        for (name, label), value in sorted(_counters.items()):
+            counters.setdefault(name, {})[label] = value
+    return {'enabled': enabled, 'stages': stages, 'counters': counters, 'cache_hit_rates': hit_rates(counters)}
+
+
+def hit_rates(counters):
+    """Return the hit rate of every counter that has 'hit' and 'miss' labels"""
+    rates = {}
+    for name, labels in counters.items():
+        hits = sum(value for label, value in labels.items() if label.startswith('hit'))
+        total = hits + labels.get('miss', 0)
+        if 'miss' in labels or hits:
+            rates[name] = hits / total if total else 0.0
+    return rates
+
+
+def prometheus_text():
+    """Return everything recorded in the Prometheus text exposition format"""
+    data = snapshot()
+    lines = ['# HELP dhl_stage_seconds Latency of each quoting stage.', '# TYPE dhl_stage_seconds histogram']
+    for stage, histogram in data['stages'].items():
+        cumulative = 0
+        for bound, n in histogram['buckets'].items():
+            cumulative += n
+            lines.append('dhl_stage_seconds_bucket{{stage="{}",le="{}"}} {}'.format(stage, bound, cumulative))
+        lines.append('dhl_stage_seconds_sum{{stage="{}"}} {!r}'.format(stage, histogram['sum_seconds']))
+        lines.append('dhl_stage_seconds_count{{stage="{}"}} {}'.format(stage, histogram['count']))
+    for name, labels in data['counters'].items():
+        lines.append('# TYPE dhl_{}_total counter'.format(name))
+        for label, value in labels.items():
+            lines.append('dhl_{}_total{{result="{}"}} {}'.format(name, label, value))
+    for name, rate in data['cache_hit_rates'].items():
+        lines.append('# TYPE dhl_{}_hit_ratio gauge'.format(name))
+        lines.append('dhl_{}_hit_ratio {!r}'.format(name, rate))
+    return '\n'.join(lines) + '\n'
+
+
+def write(path):
+    """Write the metrics to a file - Prometheus text for a .prom or .txt file, JSON otherwise"""
+    with open(path, 'w') as fh:
+        if path.endswith(('.prom', '.txt')):
+            fh.write(prometheus_text())
+        else:
+            json.dump(snapshot(), fh, indent = 2)
+
+
+instrument(dhlQuoteEngine, 'adjust_weight', 'adjust')
+instrument(dhlQuoteEngine, 'buffer_weight', 'buffer')
+instrument(dhlQuoteEngine, 'country_column', 'set_country_column')
+instrument(dhlQuoteEngine.RateTable, 'cost', 'generate_cost', timed_cost)
+instrument(dhlQuoteEngine, 'quote_weight', 'quote')
+instrument(dhlQuoteEngine, 'load_rate_table', 'workbook_load')
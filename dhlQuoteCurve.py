@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""Precomputed gross weight -> final price curves with inverse "how much fits in a budget" queries"""
+import csv
+import math
+
+import numpy as np
+
+import dhlBatchQuote
+import dhlQuoteEngine
+
+CURVE_WEIGHT = 1000    # kg covered by the precomputed curve - heavier weights are priced linearly from the last band
+SWEEP_QUANTITY = 100000    # default largest quantity of a quantity break sweep
+MAX_BUDGET = 1e9    # largest budget an inverse query takes, far past any shipment
+MIN_PIECE_GRAMS = 0.001    # lightest piece of a budget query, so the quantity stays exact in a float
+CORRECTION_STEPS = 16    # steps allowed when correcting an estimate for floating point, which is off by one or two
+
+
+def weight_units(weight):
+    """Return a weight rounded up to the nearest 1/2 KG, in half kg units"""
+    return int(round(dhlQuoteEngine.adjust_weight(weight) * 2))
+
+
+class QuoteCurve:
+    """The final price of every half kg gross weight for one origin
+
+    ``costs[u]`` is the quote for any gross weight that rounds up to ``u`` half kg units, so a forward lookup is a
+    single index. adjust_weight rounds an exact x.5 kg up to x + 1, so odd units are only reached by weights strictly
+    between x and x.5 kg.
+
+    The curve is not monotone - crossing from the weight table to the per kg bands above 70 kg makes a heavier
+    shipment cheaper - so inverse queries binary search ``suffixMin`` (the cheapest price at or above each weight),
+    which is non-decreasing. Above CURVE_WEIGHT every weight is in the last band with the largest buffer, where the
+    price rises linearly, so that tail is solved directly instead of stored.
+    """
+
+    def __init__(self, rateTable, country, maxWeight = CURVE_WEIGHT):
+        self.rateTable = rateTable
+        self.country = country
+        self.column = dhlQuoteEngine.origin_column(rateTable, country)
+        # The tail formula only holds once every weight gets the largest buffer and the last band
+        maxWeight = max((maxWeight, max(dhlQuoteEngine.BUFFER_DICT), rateTable.tableLimit)
+                        + tuple(rateTable.bandLimits))
+        self.maxUnits = int(maxWeight * 2)
+
+        self.quoter = dhlBatchQuote.BatchQuoter(rateTable, countries = (country,))
+        adjusted = np.arange(self.maxUnits + 1, dtype = np.float64) / 2
+        self.costs = self.quoter.cost(self.quoter.buffer(adjusted))[:, 0]
+        self.suffixMin = np.minimum.accumulate(self.costs[::-1])[::-1]
+        self.tailRate = rateTable.bands[self.column][-1]
+
+    def cost_units(self, units):
+        """Return the quote for a weight of units half kg units, after rounding"""
+        if units <= self.maxUnits:
+            return float(self.costs[max(units, 0)])
+        return self.rateTable.cost(dhlQuoteEngine.buffer_weight(units / 2), self.column)
+
+    def cost(self, weight):
+        """Return the quote for a gross weight in kilograms"""
+        return self.cost_units(weight_units(weight))
+
+    def cost_quantity(self, pieceWeight, quantity):
+        """Return the quote for quantity pieces weighing pieceWeight grams each"""
+        return self.cost(float(quantity * (float(pieceWeight) / 1000)))
+
+    def cost_weights(self, weights):
+        """Return the quotes for an array of gross weights in kilograms, indexing the curve for each of them"""
+        adjusted = dhlBatchQuote.adjust_weights(weights)
+        units = np.rint(adjusted * 2).astype(np.int64)
+        inCurve = units <= self.maxUnits
+        costs = self.costs[np.clip(units, 0, self.maxUnits)]
+        if not inCurve.all():
+            tail = ~inCurve
+            costs[tail] = self.quoter.cost(self.quoter.buffer(adjusted[tail]))[:, 0]
+        return costs
+
+    def sweep(self, pieceWeight, maxQuantity = SWEEP_QUANTITY):
+        """Quote every quantity from 1 to maxQuantity of a piece weighing pieceWeight grams in one pass
+
+        Returns arrays of the quantities, their costs and the cost per unit.
+        """
+        quantities = np.arange(1, int(maxQuantity) + 1, dtype = np.float64)
+        costs = self.cost_weights(quantities * (float(pieceWeight) / 1000))
+        return quantities.astype(np.int64), costs, costs / quantities
+
+    def max_units(self, budget, below = None):
+        """Return the largest rounded weight, in half kg units and less than below if given, that costs no more than
+        budget, or -1 if nothing does"""
+        budget = float(budget)
+        if not math.isfinite(budget) or budget > MAX_BUDGET:
+            raise ValueError('budget must be a number up to {:,.0f}'.format(MAX_BUDGET))
+        if below is None or below > self.maxUnits + 1:
+            tailStart = self.maxUnits + 1
+            if self.cost_units(tailStart) <= budget:
+                units = int(2 * (budget / self.tailRate - dhlQuoteEngine.BUFFER_MAX))
+                for _ in range(CORRECTION_STEPS):
+                    if self.cost_units(units + 1) > budget:
+                        break
+                    units += 1
+                else:
+                    raise ArithmeticError('no tail weight found for a budget of {!r}'.format(budget))
+                for _ in range(CORRECTION_STEPS):
+                    if units <= tailStart or self.cost_units(units) <= budget:
+                        break
+                    units -= 1
+                else:
+                    raise ArithmeticError('no tail weight found for a budget of {!r}'.format(budget))
+                return units if below is None else min(units, below - 1)
+            below = self.maxUnits + 1
+
+        if below == self.maxUnits + 1:
+            # suffixMin[u] <= budget exactly for u up to the largest affordable weight
+            return int(np.searchsorted(self.suffixMin, budget, side = 'right')) - 1
+        affordable = np.flatnonzero(self.costs[:max(below, 0)] <= budget)
+        return int(affordable[-1]) if len(affordable) else -1
+
+    def max_weight(self, budget):
+        """Return the heaviest gross weight in kilograms, to the gram, that can be shipped for budget, or None if
+        nothing can"""
+        units = self.max_units(budget)
+        if units < 0:
+            return None
+        if units % 2:    # adjust_weight rounds an exact x.5 kg up to x + 1, so odd buckets stop just short of it
+            return round(units / 2 - .001, 3)
+        return units / 2
+
+    def max_quantity(self, pieceWeight, budget):
+        """Return the largest number of pieces weighing pieceWeight grams that can be shipped for budget"""
+        pieceWeight = float(pieceWeight)
+        if not MIN_PIECE_GRAMS <= pieceWeight < math.inf:
+            raise ValueError('piece weight must be a number from {:g} g'.format(MIN_PIECE_GRAMS))
+        pieceKg = pieceWeight / 1000
+
+        units = self.max_units(budget)
+        while units >= 0:
+            # Largest quantity that rounds to no more than units, corrected for floating point either way
+            quantity = int(units / 2 / pieceKg)
+            for _ in range(CORRECTION_STEPS):
+                if quantity <= 0 or weight_units(float(quantity * pieceKg)) <= units:
+                    break
+                quantity -= 1
+            else:
+                raise ArithmeticError('no quantity found for {!r} half kg units'.format(units))
+            for _ in range(CORRECTION_STEPS):
+                if weight_units(float((quantity + 1) * pieceKg)) > units:
+                    break
+                quantity += 1
+            else:
+                raise ArithmeticError('no quantity found for {!r} half kg units'.format(units))
+            landed = weight_units(float(quantity * pieceKg))
+            if self.cost_units(landed) <= budget:
+                return quantity
+            units = self.max_units(budget, below = landed)    # pieces too coarse to land on units - try lower
+        return 0
+
+
+def write_sweep(fh, quantities, costs, perUnit):
+    """Write a quantity break sweep to an open file as CSV"""
+    writer = csv.writer(fh, lineterminator = '\n')
+    writer.writerow(['quantity', 'cost', 'cost_per_unit'])
+    writer.writerows(zip(quantities.tolist(), np.round(costs, 2).tolist(), np.round(perUnit, 4).tolist()))
+
+
+def build_curves(rateTable, countries = dhlBatchQuote.ORIGINS, maxWeight = CURVE_WEIGHT):
+    """Return a QuoteCurve for each country"""
+    return {country: QuoteCurve(rateTable, country, maxWeight) for country in countries}
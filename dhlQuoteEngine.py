@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""A headless quoting engine for the DHL freight calculator - no Tkinter required"""
+import os
+import sys
+import warnings
+
+__author__ = 'Andrew Rice'
+__copyright__ = 'Copyright 2019, Andrew Rice'
+__credits__ = []
+__license__ = ''
+__version__ = '2.0'
+__maintainer__ = 'Andrew Rice'
+__email__ = ''
+__status__ = 'Complete'
+
+
+RATES_FILE = 'dhlRates.xlsx'
+RATES_ENV = 'DHL_RATES_FILE'    # Overrides the path of the user's rate workbook
+RATES_SHEET = 'US Import Rates'
+
+TABLE_ROWS = range(15, 155)    # Weight table rows - column 1 holds the weight, 0.5 kg through 70 kg
+TABLE_LIMIT = 70    # Weights at or below this are priced from the weight table
+BAND_ROWS = (158, 159, 160, 161)    # Per kg multiplier rows for weights above TABLE_LIMIT
+BAND_LIMITS = (150, 300, 999)    # Upper bound of the first three per kg bands, the last band is open ended
+FIRST_ROW = TABLE_ROWS[0]    # The only rows read from the workbook, from the weight table through the bands
+LAST_ROW = BAND_ROWS[-1]
+
+COUNTRY_COLUMNS = {    # Key = country; Value = corresponding column on the DHL .XLSX sheet
+    'China': 9,
+    'Taiwan': 10,
+    'Hong Kong': 10,
+    'Thailand': 11
+}
+BUFFER_DICT = {    # Key = weight; Value = buffer to add
+    0: 0,
+    5: 1,
+    10: 2,
+    25: 2.5,
+    50: 5,
+    75: 8,
+    100: 12,
+    150: 17,
+    200: 20,
+    500: 35
+}
+BUFFER_MAX = 40    # Buffer added to anything heavier than the last BUFFER_DICT key
+
+
+def resource_path(relativePath):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        basePath = sys._MEIPASS
+    except Exception:
+        basePath = os.path.dirname(os.path.abspath(__file__))
+
+    return os.path.join(basePath, relativePath)
+
+
+def user_rates_path():
+    """Return where a user's own rate workbook goes - $DHL_RATES_FILE, else dhlRates.xlsx next to the executable
+
+    The workbook bundled into the one-file executable is extracted to a temp folder on every run, so it can never be
+    replaced; running from source the bundled workbook already sits next to the script.
+    """
+    if os.environ.get(RATES_ENV):
+        return os.environ[RATES_ENV]
+    if getattr(sys, 'frozen', False):
+        return os.path.join(os.path.dirname(os.path.abspath(sys.executable)), RATES_FILE)
+    return resource_path(RATES_FILE)
+
+
+def rates_path(path = None):
+    """Return the rate workbook to load - path if given, else the user's workbook if there is one, else the bundled
+    copy"""
+    if path:
+        return path
+    userPath = user_rates_path()
+    return userPath if os.path.exists(userPath) else resource_path(RATES_FILE)
+
+
+def country_column(country):
+    """Return the column of the DHL rate sheet used for an export country"""
+    return COUNTRY_COLUMNS[country]
+
+
+def origin_column(rateTable, origin):
+    """Return the column of an origin in a rate table - a calculator country, or a zone name such as 'Zone G' for a
+    table that names its columns like dhlRateCards.RateCard"""
+    columnFor = getattr(rateTable, 'column_for', None)
+    return country_column(origin) if columnFor is None else columnFor(origin)
+
+
+def adjust_weight(weight):
+    """Rounds a weight up to the nearest 1/2 KG"""
+    dec = float(weight) - int(weight)
+    if (dec < .5) and (dec > 0):
+        dec = .5
+    elif dec >= .5:
+        dec = 1
+    else:
+        dec = 0
+    return int(weight) + dec
+
+
+def buffer_weight(weight, bufferDict = BUFFER_DICT):
+    """Adds a buffer to the weight to give cushion when estimating"""
+    for wt, bf in bufferDict.items():
+        if weight <= wt:
+            return float(weight) + bf
+    return float(weight) + BUFFER_MAX
+
+
+class RateTable:
+    """Immutable, indexed copy of the rates used by the calculator
+
+    ``table`` maps a column to a dict of {weight in half kg units: cost} for the weight table and ``bands`` maps a
+    column to the four per kg multipliers. ``tableLimit`` and ``bandLimits`` give the layout - other rate tables such
+    as dhlRateCards.RateCard carry their own - so code working from the layout reads them rather than the module
+    constants. Nothing is mutated after construction, so one instance can be shared by any number of threads.
+    """
+    __slots__ = ('table', 'bands')
+    tableLimit = TABLE_LIMIT
+    bandLimits = BAND_LIMITS
+
+    def __init__(self, table, bands):
+        self.table = table
+        self.bands = bands
+
+    @classmethod
+    def from_worksheet(cls, ws, columns = None):
+        """Build the index from an openpyxl worksheet with the layout of the 'US Import Rates' sheet"""
+        if columns is None:
+            columns = sorted(set(COUNTRY_COLUMNS.values()))
+        table = {col: {} for col in columns}
+        for row in TABLE_ROWS:
+            units = int(float(ws.cell(row = row, column = 1).value) * 2)
+            for col in columns:
+                table[col][units] = float(ws.cell(row = row, column = col).value)
+        bands = {col: tuple(float(ws.cell(row = row, column = col).value) for row in BAND_ROWS) for col in columns}
+        return cls(table, bands)
+
+    @classmethod
+    def from_rows(cls, rows, columns = None, firstRow = FIRST_ROW):
+        """Build the index from rows of cell values, e.g. iter_rows(values_only = True), starting at sheet row
+        firstRow and holding at least the weight column and every origin column"""
+        if columns is None:
+            columns = sorted(set(COUNTRY_COLUMNS.values()))
+        rows = list(rows)
+        table = {col: {} for col in columns}
+        for row in TABLE_ROWS:
+            values = rows[row - firstRow]
+            units = int(float(values[0]) * 2)
+            for col in columns:
+                table[col][units] = float(values[col - 1])
+        bands = {col: tuple(float(rows[row - firstRow][col - 1]) for row in BAND_ROWS) for col in columns}
+        return cls(table, bands)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a RateTable from the plain dict produced by to_dict"""
+        table = {int(col): {int(units): cost for units, cost in rows} for col, rows in data['table'].items()}
+        bands = {int(col): tuple(rates) for col, rates in data['bands'].items()}
+        return cls(table, bands)
+
+    def to_dict(self):
+        """Return the rates as a plain, JSON serializable dict"""
+        return {
+            'table': {str(col): sorted(rows.items()) for col, rows in self.table.items()},
+            'bands': {str(col): list(rates) for col, rates in self.bands.items()}
+        }
+
+    def columns(self):
+        """Return the sheet columns held by this table"""
+        return sorted(self.table)
+
+    def cost(self, weight, column):
+        """Look up the cost of a rounded and buffered weight for a column of the rate sheet"""
+        wt = float(weight)
+        if wt <= 0:
+            return 0
+        if wt <= TABLE_LIMIT:
+            units = wt * 2
+            if units == int(units):
+                return self.table[column].get(int(units), wt)
+            return wt
+        bands = self.bands[column]
+        for limit, rate in zip(BAND_LIMITS, bands):
+            if wt <= limit:
+                return wt * rate
+        return wt * bands[-1]
+
+
+def load_rate_table(path = None, columns = None):
+    """Parse the DHL rate workbook into a RateTable
+
+    The workbook is opened read only, which streams the sheet XML instead of building every cell and skips the
+    embedded images, and only rows FIRST_ROW to LAST_ROW up to the last origin column are read before it is closed.
+    """
+    import openpyxl
+
+    path = rates_path(path)
+    if columns is None:
+        columns = sorted(set(COUNTRY_COLUMNS.values()))
+    with warnings.catch_warnings():  # .wmf image in the excel file causes a warning
+        warnings.simplefilter('ignore')
+        wb = openpyxl.load_workbook(path, read_only = True, data_only = True)
+    try:
+        rows = wb[RATES_SHEET].iter_rows(min_row = FIRST_ROW, max_row = LAST_ROW, max_col = max(columns),
+                                         values_only = True)
+        return RateTable.from_rows(rows, columns)
+    finally:
+        wb.close()
+
+
+def quote_weight(rateTable, weight, column):
+    """Round, buffer and price a single weight in kilograms"""
+    return rateTable.cost(buffer_weight(adjust_weight(weight)), column)
+
+
+def quote_per_piece(rateTable, pieceWeight, quantities, country):
+    """Quote each quantity of a piece weighing pieceWeight grams, returns a list of costs"""
+    col = origin_column(rateTable, country)
+    weightFloat = float(pieceWeight) / 1000    # weight of 1 pc in kilograms
+    return [quote_weight(rateTable, float(qty * weightFloat), col) for qty in quantities]
+
+
+def quote_shipment(rateTable, grossWeight, country):
+    """Quote an entire shipment weighing grossWeight kilograms"""
+    return quote_weight(rateTable, float(grossWeight), origin_column(rateTable, country))
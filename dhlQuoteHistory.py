@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""A local SQLite log of every quote, written in batches by a background thread
+
+Each quoted weight is one row: when it was quoted, the origin country, the quote method, the gross weight in kg (and
+the piece weight and quantity it came from for Per Piece quotes), the version of the rates it was priced with and the
+cost. ``quotes_lookup`` on (country, weight, method) answers "have we quoted this before" and weight range searches
+within a country; the single column indexes on country, method and weight serve the other searches, and as SQLite
+orders each index entry by rowid they also return the most recent quotes first without a sort. Lookups and searches
+stay in the milliseconds with millions of rows.
+
+record() only puts the quote on a queue. The writer thread owns its own connection and commits whatever has queued up
+in one transaction at a time, so the UI never waits on the disk. Lookups use a separate connection; the database is
+in WAL mode so they never block on a write in progress.
+"""
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import dhlMetrics
+import dhlRateCache
+
+HISTORY_ENV = 'DHL_QUOTE_HISTORY'    # Overrides the path of the history database
+HISTORY_FILE = 'quoteHistory.sqlite3'
+BATCH_SIZE = 500    # most quotes written in one transaction
+FLUSH_INTERVAL = 0.5    # seconds a quote may wait on the queue for more to batch with
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY,
+    quoted_at REAL NOT NULL,
+    country TEXT NOT NULL,
+    method TEXT NOT NULL,
+    weight REAL NOT NULL,
+    piece_weight REAL,
+    quantity REAL,
+    rates_version TEXT NOT NULL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_lookup ON quotes (country, weight, method);
+CREATE INDEX IF NOT EXISTS quotes_country ON quotes (country);
+CREATE INDEX IF NOT EXISTS quotes_method ON quotes (method);
+CREATE INDEX IF NOT EXISTS quotes_weight ON quotes (weight);
+'''
+COLUMNS = ('quoted_at', 'country', 'method', 'weight', 'piece_weight', 'quantity', 'rates_version', 'cost')
+
+
+def history_path():
+    """Return the path of the per user history database"""
+    return os.environ.get(HISTORY_ENV) or os.path.join(dhlRateCache.cache_dir(), HISTORY_FILE)
+
+
+def rates_version(rateTable):
+    """Return a short id of a rate table's contents - the version label of a rate card, else a hash of its rates"""
+    version = getattr(rateTable, 'version', None)
+    if version is not None:
+        return str(version)
+    data = json.dumps(rateTable.to_dict(), sort_keys = True, separators = (',', ':'))
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def connect(path):
+    """Open the history database, creating it and its indexes if needed"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok = True)
+    conn = sqlite3.connect(path, timeout = 10)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')    # WAL keeps the database consistent, only the last batch is at risk
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class QuoteHistory(threading.Thread):
+    """The quote log - call record() from any thread, lookups from the thread that created it"""
+
+    def __init__(self, path = None):
+        super().__init__(name = 'QuoteHistory', daemon = True)
+        self.path = path or history_path()
+        self.queue = queue.Queue()
+        self.lastError = None    # the exception from the last failed write, if any
+        self.reader = None    # connection used by lookups, opened on first use
+        self.versionOf = (None, None)    # (rate table, version) of the last table recorded with
+        self.start()
+
+    def version(self, rateTable):
+        """Return the version of a rate table, remembering the last one so it is hashed once per table"""
+        table, version = self.versionOf
+        if table is not rateTable:
+            version = rates_version(rateTable)
+            self.versionOf = (rateTable, version)
+        return version
+
+    def record(self, rateTable, country, method, weight, cost, pieceWeight = None, quantity = None):
+        """Queue one quote to be written"""
+        self.queue.put((time.time(), country, method, float(weight), pieceWeight, quantity, self.version(rateTable),
+                        float(cost)))
+
+    def run(self):
+        """Write queued quotes in batches until closed"""
+        conn = connect(self.path)
+        try:
+            while True:
+                item = self.queue.get()
+                pending, flushed = [], []
+                deadline = time.monotonic() + FLUSH_INTERVAL
+                while item is not None:
+                    if isinstance(item, threading.Event):
+                        flushed.append(item)
+                    else:
+                        pending.append(item)
+                    if len(pending) >= BATCH_SIZE or flushed:
+                        break
+                    try:
+                        item = self.queue.get(timeout = max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                self.write(conn, pending)
+                for event in flushed:
+                    event.set()
+                if item is None:
+                    return
+        finally:
+            conn.close()
+
+    def write(self, conn, rows):
+        """Insert a batch of quotes in one transaction"""
+        if not rows:
+            return
+        try:
+            with conn:
+                conn.executemany('INSERT INTO quotes ({}) VALUES ({})'.format(
+                    ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))), rows)
+            self.lastError = None
+        except sqlite3.Error as err:    # a locked or full disk costs this batch, not the application
+            self.lastError = err
+
+    def flush(self, timeout = None):
+        """Wait until every quote recorded so far is written"""
+        event = threading.Event()
+        self.queue.put(event)
+        return event.wait(timeout)
+
+    def close(self, timeout = 5):
+        """Write what is queued and stop the writer"""
+        self.queue.put(None)
+        self.join(timeout)
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def connection(self):
+        if self.reader is None:
+            self.reader = connect(self.path)
+        return self.reader
+
+    def find_same(self, rateTable, country, method, weight):
+        """Return (quoted_at, cost) of the last quote of this weight priced with these rates, or None"""
+        try:
+            row = self.connection().execute(
+                'SELECT quoted_at, cost FROM quotes WHERE country = ? AND method = ? AND weight = ? '
+                'AND rates_version = ? ORDER BY id DESC LIMIT 1',
+                (country, method, float(weight), self.version(rateTable))).fetchone()
+        except sqlite3.Error as err:    # the history is a convenience - never fail a quote over it
+            self.lastError = err
+            return None
+        dhlMetrics.count('quote_history', 'miss' if row is None else 'hit')
+        return row
+
+    def search(self, country = None, method = None, minWeight = None, maxWeight = None, limit = 100):
+        """Return the most recent quotes matching every filter given, as dicts"""
+        clauses, params = [], []
+        for clause, value in (('country = ?', country), ('method = ?', method), ('weight >= ?', minWeight),
+                              ('weight <= ?', maxWeight)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = 'SELECT {} FROM quotes{} ORDER BY id DESC LIMIT ?'.format(
+            ', '.join(COLUMNS), ' WHERE ' + ' AND '.join(clauses) if clauses else '')
+        return [dict(zip(COLUMNS, row)) for row in self.connection().execute(sql, params + [limit])]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""Load test a running quote service (dhlFreightCalculator.py --serve) over kept alive localhost connections"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import dhlQuoteServer
+
+
+def make_request(host, batch):
+    """Build a random quote request, returns the raw HTTP bytes"""
+    def shipment():
+        country = random.choice(['China', 'Taiwan', 'Hong Kong', 'Thailand'])
+        if random.random() < .5:
+            return {'country': country, 'method': 'Per Piece', 'piece_weight': random.randint(1, 5000),
+                    'quantities': [random.randint(1, 5000) for _ in range(5)]}
+        return {'country': country, 'method': 'Entire Shipment', 'gross_weight': random.uniform(.1, 3000)}
+
+    if batch > 1:
+        path, payload = '/quote/batch', {'shipments': [shipment() for _ in range(batch)]}
+    else:
+        path, payload = '/quote', shipment()
+    body = json.dumps(payload).encode()
+    head = ('POST {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\n'
+            'Content-Length: {}\r\n\r\n').format(path, host, len(body))
+    return head.encode('latin-1') + body
+
+
+async def client(host, port, requests, batch, latencies):
+    """Send requests one after another over a single kept alive connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            payload = make_request(host, batch)
+            start = time.perf_counter()
+            writer.write(payload)
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b' 200 ' not in status:
+                raise RuntimeError('unexpected response: {!r}'.format(status))
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, connections, requests, batch):
+    """Run every client concurrently, returns the elapsed time and the per request latencies"""
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, requests, batch, latencies) for _ in range(connections)))
+    return time.perf_counter() - start, latencies
+
+
+def main(argv = None):
+    """Run the load test and print throughput and latency percentiles"""
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('--host', default = dhlQuoteServer.DEFAULT_HOST)
+    parser.add_argument('--port', type = int, default = dhlQuoteServer.DEFAULT_PORT)
+    parser.add_argument('--connections', type = int, default = 200, help = 'concurrent kept alive connections')
+    parser.add_argument('--requests', type = int, default = 50, help = 'requests sent on each connection')
+    parser.add_argument('--batch', type = int, default = 1, help = 'shipments per request, > 1 uses /quote/batch')
+    args = parser.parse_args(argv)
+
+    elapsed, latencies = asyncio.run(load_test(args.host, args.port, args.connections, args.requests, args.batch))
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print('{:,} requests ({:,} shipments) over {} connections in {:.2f}s'.format(
+        len(latencies), len(latencies) * args.batch, args.connections, elapsed))
+    print('{:,.0f} requests/sec'.format(len(latencies) / elapsed))
+    print('latency ms: p50 {:.2f}  p90 {:.2f}  p99 {:.2f}  max {:.2f}'.format(
+        percentile(.5), percentile(.9), percentile(.99), latencies[-1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""A small asyncio HTTP/1.1 service that quotes freight from an in-memory rate table
+
+Endpoints:
+
+    GET  /health          {"status": "ok"}
+    POST /quote           one shipment, same fields as a dhlBatchCli row, returns {"costs": ...}
+    POST /quote/batch     {"shipments": [...]}, returns {"quotes": [...]} in the same order
+    GET  /metrics         Prometheus text of dhlMetrics (empty unless metrics are enabled)
+    GET  /metrics.json    the same as a JSON snapshot
+
+Connections are kept alive between requests (HTTP/1.1 default, or HTTP/1.0 with Connection: keep-alive) until the
+client closes them or they sit idle for IDLE_TIMEOUT seconds. Batches are parsed and priced on a worker thread so a
+large one does not hold up the other connections.
+"""
+import asyncio
+import json
+import math
+
+import dhlBatchCli
+import dhlMetrics
+import dhlRateWatcher
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8750
+IDLE_TIMEOUT = 30    # seconds a kept alive connection may wait for its next request
+MAX_BODY = 16 * 1024 * 1024    # largest request body accepted, in bytes
+MAX_BATCH = 10000    # most shipments in one /quote/batch request
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    """A request that is answered with an error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class QuoteServer:
+    """Serves quotes from a RateTable that is loaded once and shared by every request
+
+    ``rateTable`` may be swapped by a RateWatcher at any time; each request takes the reference once so a batch is
+    always priced from a single version of the sheet.
+    """
+
+    def __init__(self, rateTable):
+        self.rateTable = rateTable
+        self.server = None
+
+    def set_rate_table(self, rateTable):
+        """Serve quotes from a newly loaded rate table"""
+        self.rateTable = rateTable
+
+    @staticmethod
+    def quote(rateTable, shipment):
+        """Quote one shipment dict, returns the cost or list of costs"""
+        if not isinstance(shipment, dict):
+            raise HttpError(400, 'a shipment must be a JSON object')
+        for key, value in shipment.items():    # JSON allows NaN, Infinity and 1e400, none of which can be priced
+            values = value if isinstance(value, list) else [value]
+            if any(isinstance(v, float) and not math.isfinite(v) for v in values):
+                raise HttpError(400, '{} must be a finite number'.format(key))
+        try:
+            return dhlBatchCli.quote_row(rateTable, shipment)
+        except dhlBatchCli.BatchError as err:
+            raise HttpError(400, str(err))
+
+    def route(self, method, path, body):
+        """Dispatch a request, returns the status and JSON serializable response"""
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, dhlMetrics.prometheus_text()
+        if path == '/metrics.json':
+            return 200, dhlMetrics.snapshot()
+        if path not in ('/quote', '/quote/batch'):
+            raise HttpError(404, 'no such endpoint')
+        if method != 'POST':
+            raise HttpError(405, 'use POST')
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            raise HttpError(400, 'body is not valid JSON')
+
+        rateTable = self.rateTable
+        if path == '/quote':
+            return 200, {'costs': self.quote(rateTable, payload)}
+        shipments = payload.get('shipments') if isinstance(payload, dict) else None
+        if not isinstance(shipments, list):
+            raise HttpError(400, 'expected {"shipments": [...]}')
+        if len(shipments) > MAX_BATCH:
+            raise HttpError(413, 'more than {} shipments in one batch'.format(MAX_BATCH))
+        quotes = []
+        for index, shipment in enumerate(shipments):
+            try:
+                quotes.append(self.quote(rateTable, shipment))
+            except HttpError as err:
+                raise HttpError(err.status, 'shipment {}: {}'.format(index, err))
+        return 200, {'quotes': quotes}
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until it is closed or goes idle"""
+        try:
+            while True:
+                try:
+                    requestLine = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not requestLine.strip():
+                    break
+                try:
+                    method, path, version = requestLine.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'malformed request line'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keepAlive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'bad Content-Length'}, False)
+                    break
+                try:
+                    if length > MAX_BODY:
+                        raise HttpError(413, 'body larger than {} bytes'.format(MAX_BODY))
+                    body = await reader.readexactly(length) if length > 0 else b''
+                    status, response = await self.dispatch(method, path.split('?', 1)[0], body)
+                except HttpError as err:
+                    status, response = err.status, {'error': str(err)}
+                    keepAlive = keepAlive and not (err.status == 413 and length > MAX_BODY)    # body left unread
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as err:    # a bug answers this request, it does not drop the connection silently
+                    status, response, keepAlive = 500, {'error': '{}: {}'.format(type(err).__name__, err)}, False
+
+                await self.respond(writer, status, response, keepAlive)
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        """Route a request, parsing and pricing batches on the default executor to keep the event loop free"""
+        if path == '/quote/batch':
+            return await asyncio.get_running_loop().run_in_executor(None, self.route, method, path, body)
+        return self.route(method, path, body)
+
+    async def respond(self, writer, status, response, keepAlive):
+        """Write a response - JSON, or plain text when response is a string"""
+        if isinstance(response, str):
+            body, contentType = response.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, contentType = json.dumps(response).encode(), 'application/json'
+        head = ('HTTP/1.1 {} {}\r\n'
+                'Content-Type: {}\r\n'
+                'Content-Length: {}\r\n'
+                'Connection: {}\r\n\r\n').format(status, REASONS[status], contentType, len(body),
+                                                 'keep-alive' if keepAlive else 'close')
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def start(self, host = DEFAULT_HOST, port = DEFAULT_PORT):
+        """Start listening, returns the asyncio server"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port, backlog = 4096)
+        return self.server
+
+    async def serve_forever(self, host = DEFAULT_HOST, port = DEFAULT_PORT):
+        """Start listening and serve until cancelled"""
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def run_server(rateTable, host = DEFAULT_HOST, port = DEFAULT_PORT, ratesPath = None):
+    """Serve quotes until interrupted, reloading the rate table whenever the workbook (ratesPath if given) changes"""
+    quoteServer = QuoteServer(rateTable)
+    rateWatcher = dhlRateWatcher.RateWatcher(rateTable, ratesPath, onReload = quoteServer.set_rate_table)
+    rateWatcher.start()
+    print('Serving freight quotes on http://{}:{}'.format(host, port))
+    try:
+        asyncio.run(quoteServer.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rateWatcher.stop()
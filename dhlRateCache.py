@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""A compiled snapshot of the DHL rate workbook so the calculator can start without parsing the .xlsx file"""
+import hashlib
+import json
+import os
+
+import dhlMetrics
+import dhlQuoteEngine
+
+SNAPSHOT_VERSION = 1
+CACHE_DIR_ENV = 'DHL_RATES_CACHE_DIR'    # Overrides the directory the snapshot is written to
+
+
+def cache_dir():
+    """Return the per user directory snapshots are stored in
+
+    The workbook itself may live in a PyInstaller temp folder that is wiped on exit, so the snapshot is kept in the
+    user's cache directory instead of next to it.
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dhlFreightCalculator')
+
+
+def snapshot_path(path):
+    """Return the snapshot file used for a workbook"""
+    return os.path.join(cache_dir(), os.path.basename(path) + '.snapshot.json')
+
+
+def file_hash(path):
+    """Return the sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_snapshot(path):
+    """Read a snapshot file, returns None if it is missing, unreadable or from another snapshot version"""
+    try:
+        with open(path, 'r') as fh:
+            snapshot = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def write_snapshot(path, snapshot):
+    """Write a snapshot atomically, a failure to write only costs a re-parse on the next start"""
+    tmpPath = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with open(tmpPath, 'w') as fh:
+            json.dump(snapshot, fh, separators = (',', ':'))
+        os.replace(tmpPath, path)
+    except OSError:
+        try:
+            os.remove(tmpPath)
+        except OSError:
+            pass
+
+
+def load_rate_table(path = None):
+    """Load the rate table from its snapshot, rebuilding the snapshot when the workbook has changed
+
+    The snapshot is keyed by the workbook's mtime and size, falling back to its content hash when those differ, so a
+    copied or re-extracted workbook with the same contents still reuses the snapshot. openpyxl is only imported when
+    the workbook actually has to be parsed.
+    """
+    path = dhlQuoteEngine.rates_path(path)
+    stat = os.stat(path)
+    cachePath = snapshot_path(path)
+    snapshot = read_snapshot(cachePath)
+
+    if snapshot is not None and snapshot['mtime'] == stat.st_mtime and snapshot['size'] == stat.st_size:
+        dhlMetrics.count('rate_snapshot', 'hit')
+        return dhlQuoteEngine.RateTable.from_dict(snapshot['rates'])
+
+    contentHash = file_hash(path)
+    if snapshot is not None and snapshot['sha256'] == contentHash:
+        dhlMetrics.count('rate_snapshot', 'hit_hash')
+        rateTable = dhlQuoteEngine.RateTable.from_dict(snapshot['rates'])
+    else:
+        dhlMetrics.count('rate_snapshot', 'miss')
+        rateTable = dhlQuoteEngine.load_rate_table(path)
+    write_snapshot(cachePath, {
+        'version': SNAPSHOT_VERSION,
+        'sha256': contentHash,
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'rates': rateTable.to_dict()
+    })
+    return rateTable
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+"""A registry of many DHL rate cards - every sheet, origin column and dated version - held in shared compact arrays
+
+A rate card is found on a sheet by its header rows rather than fixed row numbers: a row whose first cell is 'KG'
+followed by 'Zone ...' headers starts a weight table (the longest one on the sheet is used - the 'US Import Rates'
+sheet also has a short documents table), and a row starting 'From', 'To' starts the per kg bands. Each 'Zone ...'
+column is an origin.
+
+Cards keep no openpyxl objects alive. All their numbers live in one ``array('d')`` owned by the registry and a card
+is only a set of offsets into it, so dozens of resident cards cost a few kilobytes each. Blank or non-numeric rate
+cells are stored as NaN and treated like a missing weight table row. A card can stand in for a
+dhlQuoteEngine.RateTable in the quoting functions, BatchQuoter, QuoteCurve, rate diffs and batch runs, which take
+its origins as countries or zone names (see dhlQuoteEngine.origin_column); its ``tableLimit`` and ``bandLimits``
+carry its own layout.
+"""
+import math
+import os
+import time
+import warnings
+from array import array
+from collections.abc import Mapping
+
+import dhlQuoteEngine
+
+
+def to_number(value):
+    """Read a rate sheet cell as a float - the sheet stores numbers as text like '1.44' or '99,999' - or None"""
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+def cell_number(row, col):
+    """Read the cell in sheet column col (1 based) of a row as a float, NaN if it is missing, blank or not a number"""
+    value = to_number(row[col - 1]) if col - 1 < len(row) else None
+    return float('nan') if value is None else value
+
+
+class _TableView(Mapping):
+    """Read only {half kg units: cost} view of one origin column of a card's weight table, without blank cells"""
+    __slots__ = ('card', 'index')
+
+    def __init__(self, card, index):
+        self.card = card
+        self.index = index
+
+    def __getitem__(self, units):
+        row = self.card.rowOf.get(units)
+        cost = math.nan if row is None else self.card.table_cost(self.index, row)
+        if math.isnan(cost):
+            raise KeyError(units)
+        return cost
+
+    def __iter__(self):
+        return (u for row, u in enumerate(self.card.units) if not math.isnan(self.card.table_cost(self.index, row)))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class _ColumnMap(Mapping):
+    """Maps a sheet column to a per column view of a card, like RateTable.table and RateTable.bands"""
+    __slots__ = ('card', 'view')
+
+    def __init__(self, card, view):
+        self.card = card
+        self.view = view
+
+    def __getitem__(self, column):
+        return self.view(self.card.columnIndex[column])
+
+    def __iter__(self):
+        return iter(self.card.columnIndex)
+
+    def __len__(self):
+        return len(self.card.columnIndex)
+
+
+class RateCard:
+    """One rate sheet from one workbook version, stored as offsets into the registry's shared array"""
+    __slots__ = ('sheet', 'version', 'origins', 'columnIndex', 'units', 'rowOf', 'tableLimit', 'bandLimits', 'store',
+                 'tableOffset', 'bandOffset', 'table', 'bands')
+
+    def __init__(self, sheet, version, origins, units, bandLimits, store, tableOffset, bandOffset):
+        self.sheet = sheet
+        self.version = version
+        self.origins = origins    # origin (zone) name -> sheet column
+        self.columnIndex = {col: i for i, col in enumerate(origins.values())}
+        self.units = units    # array('i') of the table weights in half kg units
+        self.rowOf = {u: row for row, u in enumerate(units)}
+        self.tableLimit = units[-1] / 2    # weights at or below this are priced from the weight table
+        self.bandLimits = bandLimits    # upper bound of each per kg band but the last
+        self.store = store
+        self.tableOffset = tableOffset
+        self.bandOffset = bandOffset
+        self.table = _ColumnMap(self, lambda i: _TableView(self, i))
+        self.bands = _ColumnMap(self, self.band_rates)
+
+    def __repr__(self):
+        return 'RateCard({!r}, {!r}, {} origins)'.format(self.sheet, self.version, len(self.origins))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a card from the plain dict produced by to_dict, in a registry of its own"""
+        return RateCardRegistry().add_dict(data)
+
+    def to_dict(self):
+        """Return the card as a plain, JSON serializable dict"""
+        return {
+            'sheet': self.sheet,
+            'version': self.version,
+            'origins': dict(self.origins),
+            'units': list(self.units),
+            'bandLimits': list(self.bandLimits),
+            'tableRates': list(self.store[self.tableOffset:self.tableOffset + len(self.origins) * len(self.units)]),
+            'bandRates': list(self.store[self.bandOffset:self.bandOffset
+                                         + len(self.origins) * (len(self.bandLimits) + 1)])
+        }
+
+    def table_cost(self, index, row):
+        """Return the weight table cost in a row for the origin at index, NaN for a blank cell"""
+        return self.store[self.tableOffset + index * len(self.units) + row]
+
+    def band_rates(self, index):
+        """Return the per kg multipliers of the origin at index"""
+        start = self.bandOffset + index * (len(self.bandLimits) + 1)
+        return tuple(self.store[start:start + len(self.bandLimits) + 1])
+
+    def columns(self):
+        """Return the sheet columns held by this card"""
+        return sorted(self.columnIndex)
+
+    def column_for(self, origin):
+        """Return the sheet column of an origin, given as a zone name ('Zone G') or a calculator country ('China')"""
+        if origin in self.origins:
+            return self.origins[origin]
+        column = dhlQuoteEngine.COUNTRY_COLUMNS.get(origin)
+        if column in self.columnIndex:
+            return column
+        raise KeyError('{!r} is not an origin of {!r}'.format(origin, self.sheet))
+
+    def cost(self, weight, column):
+        """Look up the cost of a rounded and buffered weight, with the same rules as RateTable.cost"""
+        wt = float(weight)
+        if wt <= 0:
+            return 0
+        index = self.columnIndex[column]
+        if wt <= self.tableLimit:
+            units = wt * 2
+            row = self.rowOf.get(int(units)) if units == int(units) else None
+            cost = math.nan if row is None else self.table_cost(index, row)
+            return wt if math.isnan(cost) else cost    # no matching row leaves the weight untouched, as in RateTable
+        rates = self.band_rates(index)
+        for limit, rate in zip(self.bandLimits, rates):
+            if wt <= limit:
+                return wt * rate
+        return wt * rates[-1]
+
+    def quote(self, weight, origin):
+        """Round, buffer and price a gross weight in kilograms from an origin"""
+        return dhlQuoteEngine.quote_weight(self, weight, self.column_for(origin))
+
+
+def find_rate_card(rows):
+    """Find the weight table, bands and origin columns in a sheet's rows (tuples of cell values)
+
+    Returns (origins, table rows, band limits, band rows) or None if the sheet holds no rate card.
+    """
+    tables = []
+    bandRows = []
+    bandLimits = []
+    i = 0
+    while i < len(rows):
+        row = rows[i]
+        first = str(row[0]).strip() if row and row[0] is not None else ''
+        if first == 'KG':
+            origins = {str(value).strip(): col + 1 for col, value in enumerate(row)
+                       if value is not None and str(value).strip().startswith('Zone')}
+            body = []
+            i += 1
+            while i < len(rows) and rows[i] and to_number(rows[i][0]) is not None:
+                body.append(rows[i])
+                i += 1
+            if origins and body:
+                tables.append((origins, body))
+            continue
+        if first == 'From' and len(row) > 1 and str(row[1]).strip() == 'To':
+            i += 1
+            while i < len(rows) and rows[i] and to_number(rows[i][0]) is not None:
+                bandRows.append(rows[i])
+                limit = to_number(rows[i][1])
+                bandLimits.append(limit)
+                i += 1
+            continue
+        i += 1
+    if not tables or not bandRows:
+        return None
+    origins, body = max(tables, key = lambda table: len(table[1]))
+    return origins, body, tuple(bandLimits[:-1]), bandRows    # the last band is open ended
+
+
+class RateCardRegistry:
+    """All loaded rate cards, keyed by (sheet, version), sharing a single array of numbers"""
+
+    def __init__(self):
+        self.store = array('d')
+        self.cards = {}
+
+    def add_sheet(self, sheet, version, rows):
+        """Add the rate card found in a sheet's rows, returns it or None if the sheet has no rate card"""
+        found = find_rate_card(rows)
+        if found is None:
+            return None
+        origins, body, bandLimits, bandRows = found
+        units = array('i', (int(round(to_number(row[0]) * 2)) for row in body))
+
+        values = array('d')    # gathered first so a failure leaves nothing half written in the shared store
+        for col in origins.values():
+            values.extend(cell_number(row, col) for row in body)
+        bandStart = len(values)
+        for col in origins.values():
+            values.extend(cell_number(row, col) for row in bandRows)
+        tableOffset = len(self.store)
+        bandOffset = tableOffset + bandStart
+        self.store.extend(values)
+
+        card = RateCard(sheet, version, origins, units, bandLimits, self.store, tableOffset, bandOffset)
+        self.cards[(sheet, version)] = card
+        return card
+
+    def add_dict(self, data):
+        """Add a card from the plain dict produced by RateCard.to_dict, returns it"""
+        values = array('d', data['tableRates'])
+        bandStart = len(values)
+        values.extend(data['bandRates'])
+        tableOffset = len(self.store)
+        self.store.extend(values)
+        card = RateCard(data['sheet'], data['version'], dict(data['origins']), array('i', data['units']),
+                        tuple(data['bandLimits']), self.store, tableOffset, tableOffset + bandStart)
+        self.cards[(card.sheet, card.version)] = card
+        return card
+
+    def load_workbook(self, path, version = None):
+        """Discover and add every rate card in a workbook, returns the cards added
+
+        version labels this copy of the workbook, defaulting to the date it was last modified.
+        """
+        import openpyxl
+
+        if version is None:
+            version = time.strftime('%Y-%m-%d', time.localtime(os.path.getmtime(path)))
+        with warnings.catch_warnings():  # .wmf image in the excel file causes a warning
+            warnings.simplefilter('ignore')
+            wb = openpyxl.load_workbook(path, read_only = True, data_only = True)
+        try:
+            added = []
+            for ws in wb.worksheets:
+                card = self.add_sheet(ws.title, version, [tuple(row) for row in ws.iter_rows(values_only = True)])
+                if card is not None:
+                    added.append(card)
+            return added
+        finally:
+            wb.close()
+
+    def versions(self, sheet = dhlQuoteEngine.RATES_SHEET):
+        """Return the loaded versions of a sheet, oldest first"""
+        return sorted(version for name, version in self.cards if name == sheet)
+
+    def get(self, sheet = dhlQuoteEngine.RATES_SHEET, version = None):
+        """Return the card for a sheet, the latest loaded version unless one is given"""
+        if version is None:
+            versions = self.versions(sheet)
+            if not versions:
+                raise KeyError('no rate card loaded for {!r}'.format(sheet))
+            version = versions[-1]
+        return self.cards[(sheet, version)]
+
+    def memory_bytes(self):
+        """Return the bytes used by the shared array holding every card's rates"""
+        return self.store.itemsize * len(self.store)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""Compare two versions of the DHL rate sheet and re-price only the stored quotes the change affects
+
+A diff lists, per origin column, the weight table rows (15-154, as half kg units) and per kg bands (rows 158-161)
+whose rate changed. Gross weight -> adjusted weight -> buffered weight only ever increases, so the gross weights
+priced from any one table row or band form a range. The changed rows and bands are turned into gross weight ranges
+and only the quote history rows inside them are read, through the history's (country, weight) index, and re-priced.
+A typical update touching a few rows re-prices a sliver of the history instead of all of it. If the new sheet has a
+different layout - another weight table limit or set of bands - every stored quote is re-priced.
+"""
+import csv
+import sys
+import time
+
+import dhlQuoteEngine
+import dhlQuoteHistory
+
+REPORT_COLUMNS = ('id', 'quoted_at', 'country', 'method', 'weight', 'stored_cost', 'old_cost', 'new_cost', 'delta')
+
+
+class RateDiff:
+    """The rates that differ between two rate tables, by sheet column"""
+    __slots__ = ('columns', 'table', 'bands', 'tableLimit', 'bandLimits', 'layoutChanged')
+
+    def __init__(self, columns, table, bands, tableLimit = dhlQuoteEngine.TABLE_LIMIT,
+                 bandLimits = dhlQuoteEngine.BAND_LIMITS, layoutChanged = False):
+        self.columns = columns
+        self.table = table    # column -> sorted half kg units whose weight table rate changed
+        self.bands = bands    # column -> indexes of the per kg bands whose multiplier changed
+        self.tableLimit = tableLimit    # layout of the new rates
+        self.bandLimits = bandLimits
+        self.layoutChanged = layoutChanged    # the weight table limit or bands moved, so any quote may change
+
+    def __bool__(self):
+        return self.layoutChanged or any(self.table.values()) or any(self.bands.values())
+
+    def summary(self):
+        """Return a printable description of the changes"""
+        lines = ['rate sheet layout changed, every quote is re-priced'] if self.layoutChanged else []
+        for col in self.columns:
+            if self.table[col] or self.bands[col]:
+                countries = ', '.join(countries_of(col))
+                lines.append('column {} ({}): {} weight table rows, bands {}'.format(
+                    col, countries, len(self.table[col]), list(self.bands[col]) or 'unchanged'))
+        return '\n'.join(lines) or 'no rate changes'
+
+
+def countries_of(column):
+    """Return the calculator countries priced from a sheet column"""
+    return sorted(country for country, col in dhlQuoteEngine.COUNTRY_COLUMNS.items() if col == column)
+
+
+def diff_rate_tables(old, new, columns = None):
+    """Return the RateDiff between two rate tables (or rate cards) over the columns both hold"""
+    if columns is None:
+        columns = sorted(set(old.columns()) & set(new.columns()))
+    table = {}
+    bands = {}
+    for col in columns:
+        oldRows, newRows = old.table[col], new.table[col]
+        table[col] = sorted(u for u in set(oldRows) | set(newRows) if oldRows.get(u) != newRows.get(u))
+        bands[col] = [i for i, (a, b) in enumerate(zip(old.bands[col], new.bands[col])) if a != b]
+    layoutChanged = (old.tableLimit != new.tableLimit or tuple(old.bandLimits) != tuple(new.bandLimits)
+                     or any(len(old.bands[col]) != len(new.bands[col]) for col in columns))
+    return RateDiff(columns, table, bands, new.tableLimit, tuple(new.bandLimits), layoutChanged)
+
+
+def price_slot(units, tableLimit = dhlQuoteEngine.TABLE_LIMIT, bandLimits = dhlQuoteEngine.BAND_LIMITS):
+    """Return what prices an adjusted weight of units half kg units - ('table', units) or ('band', index)"""
+    buffered = dhlQuoteEngine.buffer_weight(units / 2)
+    if buffered <= tableLimit:
+        return 'table', int(buffered * 2)
+    for index, limit in enumerate(bandLimits):
+        if buffered <= limit:
+            return 'band', index
+    return 'band', len(bandLimits)
+
+
+def affected_ranges(diff, column):
+    """Return the gross weight ranges, as inclusive (low, high) kg, holding every weight whose price may change
+
+    Ranges are a little generous at their edges - an adjusted weight of x kg is reached from [x - 0.5, x] - and the
+    quotes found are re-priced exactly, so nothing is reported that did not change.
+    """
+    if diff.layoutChanged:
+        return [(0.0, float('inf'))]
+    changedUnits = set(diff.table[column])
+    changedBands = set(diff.bands[column])
+    gridUnits = int(2 * (max((diff.tableLimit,) + diff.bandLimits) + 1))    # past this all are in the last band
+    ranges = []
+    for units in range(1, gridUnits + 1):
+        kind, key = price_slot(units, diff.tableLimit, diff.bandLimits)
+        if key in (changedUnits if kind == 'table' else changedBands):
+            low, high = units / 2 - .5, units / 2
+            if ranges and ranges[-1][1] >= low:
+                ranges[-1] = (ranges[-1][0], high)
+            else:
+                ranges.append((low, high))
+    if len(diff.bandLimits) in changedBands:    # the open ended band runs past the grid
+        low = gridUnits / 2
+        if ranges and ranges[-1][1] >= low:
+            low = ranges.pop()[0]
+        ranges.append((low, float('inf')))
+    return ranges
+
+
+def reprice(conn, old, new, diff = None, full = False):
+    """Re-price the stored quotes whose price differs between the old and new rates
+
+    Only quotes inside the diff's affected ranges are read unless full is set, which re-prices every stored quote
+    (for checking and timing). Returns one dict per changed quote with REPORT_COLUMNS.
+    """
+    if diff is None:
+        diff = diff_rate_tables(old, new)
+    select = 'SELECT id, quoted_at, country, method, weight, cost FROM quotes'
+    queries = []
+    for col in diff.columns:
+        countries = countries_of(col)
+        if full:
+            queries.append((col, '{} WHERE country IN ({})'.format(select, ', '.join('?' * len(countries))),
+                            countries))
+            continue
+        for low, high in affected_ranges(diff, col):
+            sql = '{} WHERE country IN ({}) AND weight >= ?'.format(select, ', '.join('?' * len(countries)))
+            params = countries + [low]
+            if high != float('inf'):
+                sql += ' AND weight <= ?'
+                params.append(high)
+            queries.append((col, sql, params))
+
+    deltas = []
+    for col, sql, params in queries:
+        for quoteId, quotedAt, country, method, weight, storedCost in conn.execute(sql, params):
+            oldCost = dhlQuoteEngine.quote_weight(old, weight, col)
+            newCost = dhlQuoteEngine.quote_weight(new, weight, col)
+            if newCost != oldCost:
+                deltas.append(dict(zip(REPORT_COLUMNS, (quoteId, quotedAt, country, method, weight, storedCost,
+                                                        oldCost, newCost, newCost - oldCost))))
+    deltas.sort(key = lambda delta: delta['id'])
+    return deltas
+
+
+def write_report(fh, deltas):
+    """Write the changed quotes as CSV"""
+    writer = csv.DictWriter(fh, fieldnames = REPORT_COLUMNS, lineterminator = '\n')
+    writer.writeheader()
+    for delta in deltas:
+        row = dict(delta)
+        row['quoted_at'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(delta['quoted_at']))
+        for key in ('stored_cost', 'old_cost', 'new_cost', 'delta'):
+            row[key] = '{:.2f}'.format(delta[key])
+        writer.writerow(row)
+
+
+def summarize(deltas):
+    """Return the number of changed quotes, their total change and the largest rise and fall, by country"""
+    totals = {}
+    for delta in deltas:
+        count, total, rise, fall = totals.get(delta['country'], (0, 0.0, 0.0, 0.0))
+        totals[delta['country']] = (count + 1, total + delta['delta'], max(rise, delta['delta']),
+                                    min(fall, delta['delta']))
+    return totals
+
+
+def run_rate_diff(oldPath, newPath, historyPath = None, outPath = '-'):
+    """Diff two rate workbooks and write the delta report of the stored quotes they re-price, summary on stderr"""
+    old = dhlQuoteEngine.load_rate_table(oldPath)
+    new = dhlQuoteEngine.load_rate_table(newPath)
+    diff = diff_rate_tables(old, new)
+    print(diff.summary(), file = sys.stderr)
+
+    conn = dhlQuoteHistory.connect(historyPath or dhlQuoteHistory.history_path())
+    start = time.perf_counter()
+    try:
+        deltas = reprice(conn, old, new, diff) if diff else []
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+
+    outFile = sys.stdout if outPath == '-' else open(outPath, 'w', newline = '')
+    try:
+        write_report(outFile, deltas)
+    finally:
+        if outFile is not sys.stdout:
+            outFile.close()
+    for country, (count, total, rise, fall) in sorted(summarize(deltas).items()):
+        print('{}: {:,} quotes change, {:+,.2f} in total (largest rise {:+,.2f}, largest fall {:+,.2f})'.format(
+            country, count, total, rise, fall), file = sys.stderr)
+    print('Re-priced {:,} quotes in {:.2f}s'.format(len(deltas), elapsed), file = sys.stderr)
+    return deltas
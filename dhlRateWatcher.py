@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Watches the DHL rate workbook and swaps in a freshly parsed rate table when it changes"""
+import os
+import threading
+
+import dhlQuoteEngine
+import dhlRateCache
+
+POLL_INTERVAL = 2.0    # seconds between checks of the workbook's mtime and size
+
+
+class RateWatcher(threading.Thread):
+    """Background thread that reloads the rate table when the workbook changes
+
+    The new workbook is parsed entirely on this thread and only then published by rebinding ``rateTable`` - a single
+    reference assignment - so readers see either the old table or the new one, never a half loaded sheet. Readers
+    should take ``rateTable`` once per quote (or per batch) and use that reference throughout.
+
+    ``onReload`` callbacks are called on the watcher thread with the new table. They must not touch Tkinter widgets;
+    rebinding an attribute is fine.
+
+    Without a path the user's workbook (dhlQuoteEngine.user_rates_path) is watched, even before it exists, so a rate
+    sheet saved next to the executable is picked up by the frozen app.
+    """
+
+    def __init__(self, rateTable, path = None, interval = POLL_INTERVAL, onReload = None):
+        super().__init__(name = 'RateWatcher', daemon = True)
+        self.path = path or dhlQuoteEngine.user_rates_path()
+        self.interval = interval
+        self.rateTable = rateTable
+        self.callbacks = [onReload] if onReload else []
+        self.lastError = None    # the exception from the last failed reload, if any
+        self.failedKey = None    # the workbook version that last failed to load, not retried until it changes
+        self.stopEvent = threading.Event()
+        self.loadedKey = self.file_key()
+
+    def file_key(self):
+        """Return what identifies the current version of the workbook on disk"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def run(self):
+        """Poll the workbook until stopped, reloading once a change has settled"""
+        pendingKey = None
+        while not self.stopEvent.wait(self.interval):
+            key = self.file_key()
+            if key is None or key == self.loadedKey or key == self.failedKey:
+                pendingKey = None
+                continue
+            if key != pendingKey:    # still being written - wait for it to stay unchanged for one interval
+                pendingKey = key
+                continue
+            self.reload(key)
+            pendingKey = None
+
+    def reload(self, key = None):
+        """Parse the workbook and publish the new table, keeping the old one if the file cannot be read"""
+        try:
+            rateTable = dhlRateCache.load_rate_table(self.path)
+        except Exception as err:    # a partially copied or corrupt workbook - retry on the next change
+            self.lastError = err
+            self.failedKey = key
+            return False
+        self.lastError = None
+        self.failedKey = None
+        self.loadedKey = key or self.file_key()
+        self.rateTable = rateTable
+        for callback in self.callbacks:
+            callback(rateTable)
+        return True
+
+    def stop(self):
+        """Stop watching"""
+        self.stopEvent.set()
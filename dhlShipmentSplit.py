@@ -0,0 +1,546 @@
+#!/usr/bin/env python
+"""Find the cheapest way to split a shipment into parcels
+
+Heavy shipments leave the weight table for the per kg bands and every parcel gets the step shaped weight buffer, so
+several parcels can cost less than one. The split is found by dynamic programming over item counts - grams of bulk
+weight, or pieces that cannot be divided - and every parcel is priced at its exact weight:
+
+* A parcel's price only depends on the half kg bucket its weight rounds up to, so a parcel of bucket u can hold any
+  count from ``lows[u]`` to ``highs[u]`` and ``best[n] = min over u of cost[u] + min(best[n - highs[u]:n - lows[u]])``.
+* ``best`` barely changes inside a bucket, so it is stored as runs of counts with the same cost and each bucket of
+  counts is solved in a handful of vectorized steps - one for every offset where some parcel's window crosses a run.
+* When the buckets repeat every two, as whole grams do, a window only depends on the parity of its count's bucket and
+  its parcel's, and nearly every bucket of counts costs the same throughout. Then a count's cost is the best of a
+  few running convolutions of the parcel costs with those flat bucket costs, and only the parcels whose window takes
+  in one of the rare uneven buckets are stepped through its runs.
+* Once ``best[n]`` is the bulk parcel (the cheapest per item) plus the best of its window across a run as long as the
+  largest parcel, that holds for every larger n. Whole grams reach it by about 1.3 t, pieces of an uneven weight may
+  never, so their work grows with the quantity - hence the MAX_SPLIT_PIECES cap.
+* Heavier parcels than the quote curve (CURVE_WEIGHT) are only ever the left over parcel: above the last band limit
+  the price is linear plus one buffer, so two such parcels always cost more than the same weight in one.
+"""
+import math
+
+import numpy as np
+
+import dhlBatchQuote
+import dhlQuoteCurve
+import dhlQuoteEngine
+
+CACHE_SIZE = 64    # split tables kept per origin, one per item weight
+WEIGHT_PLACES = 6    # decimals of a kg that parcel weights are shown to - the milligram, past any float noise
+GROWTH = 4096    # initial capacity of the run and cell arrays, doubled when full
+TEMPLATE_CELL = 40    # cells whose windows make the templates of a regular grid, clear of the first few
+TEMPLATE_UNITS = (21, 20, 1, 2)    # one bucket of each kind the templates cover
+TEMPLATE_START = 8    # cells before this are solved from their runs, as windows there reach below count 0
+MAX_SPLIT_WEIGHT = 1000000    # kg, the heaviest shipment that is split
+MAX_SPLIT_PIECES = 10000    # pieces of one split, each count up to it may need solving - about a second at worst
+MIN_PIECE_GRAMS = 0.1    # lightest piece, a half kg bucket of them is solved at once
+MAX_SOLVE_ITEMS = 4000000    # counts a table solves looking for the bulk recurrence before giving up
+
+
+def item_units(counts, itemGrams):
+    """Return the half kg units that counts of items weighing itemGrams each round up to, like weight_units"""
+    weights = np.asarray(counts, dtype = np.float64) * itemGrams / 1000
+    return np.rint(dhlBatchQuote.adjust_weights(weights) * 2).astype(np.int64)
+
+
+def bucket_highs(itemGrams, units):
+    """Return the largest count of items that rounds up to no more than each of units"""
+    units = np.asarray(units, dtype = np.int64)
+    highs = np.floor(units * (500 / itemGrams)).astype(np.int64) + 1
+    while True:    # corrected for floating point either way, as in QuoteCurve.max_quantity
+        over = item_units(highs, itemGrams) > units
+        if not over.any():
+            break
+        highs[over] -= 1
+    while True:
+        under = item_units(highs + 1, itemGrams) <= units
+        if not under.any():
+            return highs
+        highs[under] += 1
+
+
+def grown(values, size, fill):
+    """Return values with room for at least size entries, doubling it and padding with fill when it is short"""
+    if size <= len(values):
+        return values
+    return np.concatenate([values, np.full(max(size, 2 * len(values)) - len(values), fill, dtype = values.dtype)])
+
+
+def bulk_sizes(items, parcels):
+    """Return items split as evenly as possible into parcels"""
+    if not parcels:
+        return []
+    size, rest = divmod(items, parcels)
+    return [size + 1] * rest + [size] * (parcels - rest)
+
+
+def checked(value, limit, name):
+    """Return value as a float, raising ValueError if it is not finite or above limit"""
+    value = float(value)
+    if not math.isfinite(value) or value > limit:
+        raise ValueError('{} must be a number up to {:,}'.format(name, limit))
+    return value
+
+
+class Parcel:
+    """One parcel of a split shipment"""
+    __slots__ = ('items', 'weight', 'cost')
+
+    def __init__(self, items, weight, cost):
+        self.items = items    # pieces, or grams of bulk weight
+        self.weight = weight    # kg, exact - round it for display only
+        self.cost = cost
+
+    def __repr__(self):
+        return 'Parcel({!r}, {!r}, {!r})'.format(self.items, self.weight, self.cost)
+
+
+class ShipmentSplit:
+    """The cheapest split found for a shipment, with the price of sending it as one parcel for comparison"""
+    __slots__ = ('country', 'parcels', 'cost', 'unsplitCost')
+
+    def __init__(self, country, parcels, unsplitCost):
+        self.country = country
+        self.parcels = parcels
+        self.cost = sum(parcel.cost for parcel in parcels)
+        self.unsplitCost = unsplitCost
+
+    @property
+    def savings(self):
+        return self.unsplitCost - self.cost
+
+    def groups(self):
+        """Return (count, weight to the milligram, cost of one) for each distinct parcel, heaviest first"""
+        groups = {}
+        for parcel in self.parcels:
+            key = (round(parcel.weight, WEIGHT_PLACES), parcel.cost)
+            groups[key] = groups.get(key, 0) + 1
+        return [(count, weight, cost) for (weight, cost), count in sorted(groups.items(), reverse = True)]
+
+    def to_dict(self):
+        """Return the split as a JSON serializable dict"""
+        return {
+            'country': self.country,
+            'cost': round(self.cost, 2),
+            'unsplit_cost': round(self.unsplitCost, 2),
+            'savings': round(self.savings, 2),
+            'parcels': [{'items': p.items, 'weight': round(p.weight, WEIGHT_PLACES), 'cost': round(p.cost, 2)}
+                        for p in self.parcels]
+        }
+
+
+class SplitTable:
+    """The cheapest split of every number of items of one weight into parcels on the quote curve
+
+    Counts are solved a cell at a time - a cell is the counts that round up to one half kg bucket - and stored as
+    runs: ``starts[r]`` is the first count of run r and ``values[r]`` the cost of every count in it. A cell that is
+    one run has its cost in ``flat``, the few that are not are listed in ``uneven``. ``periodStart`` is set once the
+    bulk parcel recurrence is proven.
+    """
+
+    def __init__(self, curve, itemGrams):
+        self.curve = curve
+        self.itemGrams = itemGrams
+        self.maxUnits = curve.maxUnits
+        self.cellHighs = bucket_highs(itemGrams, np.arange(self.maxUnits + 1))
+        lows = np.concatenate([[1], self.cellHighs[:-1] + 1])
+        costs = np.where(np.isnan(curve.costs), np.inf, curve.costs)
+        usable = (lows <= self.cellHighs) & np.isfinite(costs)
+        usable[0] = False
+        self.unitCosts = np.where(usable, costs, np.inf)    # parcel cost of each bucket, inf where none fits
+        self.usable = usable
+        self.indexOf = np.cumsum(usable) - 1    # bucket -> index into lows, highs and costs
+        self.lows = lows[usable]
+        self.highs = self.cellHighs[usable]
+        self.costs = costs[usable]
+        self.largest = int(self.highs[-1]) if len(self.highs) else 0
+
+        self.bulkIndex = int(np.argmin(self.costs / self.highs)) if len(self.highs) else 0
+        if len(self.highs):
+            self.bulkUnits = int(np.flatnonzero(usable)[self.bulkIndex])
+            self.bulkLow = int(self.lows[self.bulkIndex])
+            self.bulkHigh = int(self.highs[self.bulkIndex])
+            self.bulkCost = float(self.costs[self.bulkIndex])
+
+        self.starts = np.zeros(GROWTH, dtype = np.int64)
+        self.values = np.full(GROWTH, np.inf)
+        self.values[0] = 0.0
+        self.runs = 1
+        self.runOf = np.full(GROWTH, -1, dtype = np.int32)    # run of each count, shifted by one so -1 maps to -1
+        self.runOf[1] = 0
+        self.end = 0    # every count up to here is solved
+        self.cell = 0    # bucket of the last solved count
+        self.holdStart = None    # first count of the current run where the bulk recurrence holds
+        self.periodStart = None
+        self.sparse = None    # range minimum table over the runs, for reduce() queries
+
+        self.flat = np.full(GROWTH, np.inf)    # cost of each cell that is one run, inf for the rest and cell 0
+        self.uneven = []
+        self.template = self.make_template()
+        if self.template is not None:
+            self.oddUnits = np.arange(3, self.maxUnits + 1, 2)
+            self.evenUnits = np.arange(4, self.maxUnits + 1, 2)
+            self.convolved = (np.full(GROWTH, np.inf), np.full(GROWTH, np.inf))
+            for cell in range(4):
+                self.convolve(cell)
+
+    def make_template(self):
+        """Return where each bucket's window falls among the cells, if the cells repeat every two buckets
+
+        Then a window only depends on the parity of its cell and bucket, so each parity of cell gets (its width,
+        stretches, the lowest and highest span). A stretch is [counts, spans] - that many counts of the cell and the
+        cells every window covers over them, relative to the cell less the bucket. The spans are for odd buckets from
+        3, even buckets from 4, bucket 1 and bucket 2, as (first, last) or None where the window is empty.
+        """
+        highs = self.cellHighs
+        steps = highs[2:] - highs[:-2]
+        if len(highs) <= 2 * TEMPLATE_CELL or (steps != steps[0]).any():
+            return None
+        lows = np.concatenate([[0], highs[:-1] + 1])
+        template = []
+        for cell in (TEMPLATE_CELL, TEMPLATE_CELL + 1):
+            counts = np.arange(lows[cell], highs[cell] + 1)
+            if not len(counts):    # pieces heavier than half a kg leave cells empty
+                return None
+            columns = []
+            for units, reach in zip(TEMPLATE_UNITS, (1, 2, None, None)):
+                first, last = counts - highs[units], counts - lows[units]
+                if reach is None:    # buckets 1 and 2 reach into the cell, which is added count by count
+                    last = np.minimum(last, lows[cell] - 1)
+                base = cell - units
+                firstCells, lastCells = np.searchsorted(highs, first) - base, np.searchsorted(highs, last) - base
+                if reach is not None and lastCells.max() > reach:
+                    return None
+                columns.append([(int(a), int(b)) if stop >= start else None
+                                for start, stop, a, b in zip(first, last, firstCells, lastCells)])
+            stretches = []
+            for spans in zip(*columns):
+                if stretches and stretches[-1][1] == spans:
+                    stretches[-1][0] += 1
+                else:
+                    stretches.append([1, spans])
+            spans = [span for _, row in stretches for span in row if span is not None]
+            template.append((len(counts), stretches, min(a for a, _ in spans), max(b for _, b in spans)))
+        return template
+
+    def convolve(self, cell):
+        """Work out the cheapest odd and even bucket of 3 or more plus any count of the cell that many back, above 0"""
+        self.flat = grown(self.flat, cell + 1, np.inf)
+        self.convolved = tuple(grown(values, cell + 1, np.inf) for values in self.convolved)
+        for values, units in zip(self.convolved, (self.oddUnits, self.evenUnits)):
+            units = units[:np.searchsorted(units, cell)]
+            values[cell] = (self.unitCosts[units] + self.flat[cell - units]).min(initial = np.inf)
+
+    def solved(self):
+        return self.starts[:self.runs], self.values[:self.runs]
+
+    def run_of(self, counts):
+        """Return the run of each solved count, or -1 for a count of -1"""
+        return self.runOf[counts + 1].astype(np.int64)
+
+    def window_min(self, begin, stop):
+        """Return the cheapest cost over runs begin to stop for each window, inf where stop is before begin"""
+        lowest = np.where(stop >= begin, self.values[np.minimum(begin, self.runs - 1)], np.inf)
+        for step in range(1, int((stop - begin).max(initial = 0)) + 1):
+            lowest = np.minimum(lowest, np.where(stop - begin >= step, self.values[np.minimum(begin + step,
+                                                                                            self.runs - 1)], np.inf))
+        return lowest
+
+    def reaches(self, last):
+        """Return whether every window ending at or before last can be folded into the solved counts"""
+        if last <= self.end:
+            return True
+        if self.periodStart is None:
+            return False
+        bulk = -(-(last - self.end) // self.bulkLow)
+        return self.end - self.periodStart >= self.largest + (bulk - 1) * (self.bulkHigh - self.bulkLow)
+
+    def extend(self, last):
+        """Solve counts a cell at a time until windows ending at last can be answered"""
+        if not len(self.highs):
+            return
+        while not self.reaches(last):
+            if self.end > MAX_SOLVE_ITEMS:
+                raise ValueError('no repeating split found within {:,} items of {:g} g'.format(MAX_SOLVE_ITEMS,
+                                                                                               self.itemGrams))
+            self.cell += 1
+            if self.cell >= len(self.cellHighs):    # past the curve - cells stay on the bucket grid
+                more = np.arange(len(self.cellHighs), 2 * len(self.cellHighs))
+                self.cellHighs = np.concatenate([self.cellHighs, bucket_highs(self.itemGrams, more)])
+            high = int(self.cellHighs[self.cell])
+            if high > self.end:
+                self.solve_cell(self.end + 1, high)
+            if self.template is not None:
+                self.convolve(self.cell + 3)
+
+    def count_costs(self, lo, hi, indices):
+        """Return the cheapest of buckets indices, and the bulk parcel's cost, for each count lo to hi
+
+        Windows are cut off below lo and stepped through the runs of solved counts.
+        """
+        counts = np.arange(lo, hi + 1)[:, None]
+        first = np.maximum(counts - self.highs[indices], 0)
+        last = np.maximum(np.minimum(counts - self.lows[indices], lo - 1), -1)
+        lowest = self.window_min(self.run_of(np.minimum(first, lo - 1)), self.run_of(last))
+        totals = np.where(last >= first, lowest, np.inf) + self.costs[indices]
+        bulk = np.flatnonzero(indices == self.bulkIndex)
+        return totals.min(axis = 1), totals[:, bulk[0]] if len(bulk) else np.full(hi - lo + 1, np.inf)
+
+    def flat_min(self, first, last):
+        """Return the cheapest flat cell cost from cell first to last, cells below 1 being left out"""
+        return min((self.flat[index] for index in range(max(first, 1), last + 1)), default = np.inf)
+
+    def template_costs(self, lo, hi, template):
+        """Return the cheapest bucket, and the bulk parcel's cost, for each count lo to hi of a regular cell
+
+        Every window is made of whole flat cells, so the best odd and even bucket over a span of cells is the best of
+        their convolved costs. Buckets whose window takes in an uneven cell are added from its runs.
+        """
+        cell = self.cell
+        _, stretches, reachLow, reachHigh = template
+        odd, even = self.convolved
+        bulkKind = 2 if self.bulkUnits == 1 else 3 if self.bulkUnits == 2 else self.bulkUnits % 2 ^ 1
+        cheapest, bulkTotals = [], []
+        for _, spans in stretches:
+            best = bulkBest = np.inf
+            for kind, span in enumerate(spans):
+                if span is None:
+                    continue
+                first, last = span
+                if kind < 2:
+                    convolved = (odd, even)[kind]
+                    best = min(best, *(convolved[index] for index in range(cell + first, cell + last + 1)))
+                else:
+                    best = min(best, self.unitCosts[kind - 1] + self.flat_min(cell - kind + 1 + first,
+                                                                             cell - kind + 1 + last))
+                if kind == bulkKind:
+                    base = cell - self.bulkUnits
+                    bulkBest = self.bulkCost + self.flat_min(base + first, base + last)
+            cheapest.append(best)
+            bulkTotals.append(bulkBest)
+        if cell <= self.maxUnits:    # one parcel of the cell's own bucket
+            cheapest = [min(best, self.unitCosts[cell]) for best in cheapest]
+            if cell == self.bulkUnits:
+                bulkTotals = [self.bulkCost] * len(bulkTotals)
+        lengths = [count for count, _ in stretches]
+        cheapest, bulkTotals = np.repeat(cheapest, lengths), np.repeat(bulkTotals, lengths)
+
+        units = set()
+        for uneven in reversed(self.uneven):
+            if cell + reachLow - uneven > self.maxUnits:
+                break
+            units.update(range(max(cell + reachLow - uneven, 1), min(cell + reachHigh - uneven, self.maxUnits) + 1))
+        units = np.array(sorted(units), dtype = np.int64)
+        if len(units):
+            units = units[self.usable[units]]
+            exact = self.count_costs(lo, hi, self.indexOf[units])
+            cheapest, bulkTotals = np.minimum(cheapest, exact[0]), np.minimum(bulkTotals, exact[1])
+        return cheapest, bulkTotals
+
+    def solve_cell(self, lo, hi):
+        """Solve the counts lo to hi, one cell, from the runs below lo"""
+        usable = int(np.searchsorted(self.lows, hi, side = 'right'))
+        lows, highs, costs = self.lows[:usable], self.highs[:usable], self.costs[:usable]
+        template = self.template[self.cell % 2] if self.template is not None and self.cell >= TEMPLATE_START else None
+        if template is not None and template[0] == hi - lo + 1:
+            cheapest, bulkTotals = self.template_costs(lo, hi, template)
+        else:
+            cheapest, bulkTotals = self.count_costs(lo, hi, np.arange(usable))
+        holds = np.isfinite(bulkTotals) & (bulkTotals <= cheapest + 1e-9)
+
+        # Buckets light enough to reach back into this cell - their in cell part is added count by count, only
+        # where an earlier count of the cell plus one such parcel could beat the rest
+        inCell = lows <= hi - lo
+        smallCost = costs[inCell].min() if inCell.any() else np.inf
+        cell = np.empty(hi - lo + 1)
+        changes = np.flatnonzero((cheapest[1:] != cheapest[:-1]) | (holds[1:] != holds[:-1])) + 1
+        seen = np.inf
+        for start, close in zip([0] + changes.tolist(), changes.tolist() + [hi - lo + 1]):
+            cost = cheapest[start]
+            if smallCost + seen < cost:
+                for n in range(lo + start, lo + close):
+                    best = cost
+                    for low, high, parcelCost in zip(lows[inCell], highs[inCell], costs[inCell]):
+                        if n - low >= lo:
+                            best = min(best, parcelCost + cell[max(n - high, lo) - lo:n - low - lo + 1].min())
+                    cell[n - lo] = best
+                hold = False
+            else:
+                cell[start:close] = cost
+                hold = holds[start]
+            seen = min(seen, cell[start:close].min())
+
+            if not hold:
+                self.holdStart = None
+            elif self.holdStart is None:
+                self.holdStart = lo + start
+
+        marks = np.concatenate([[cell[0] != self.values[self.runs - 1]], cell[1:] != cell[:-1]])
+        runStarts = np.flatnonzero(marks)
+        self.runOf = grown(self.runOf, hi + 2, -1)
+        self.runOf[lo + 1:hi + 2] = self.runs - 1 + np.cumsum(marks)
+        self.append(runStarts + lo, cell[runStarts])
+        self.flat = grown(self.flat, self.cell + 1, np.inf)
+        if cell.max() - cell.min() <= 1e-9:    # sums of the same costs in another order are flat enough
+            self.flat[self.cell] = cell.min()
+        else:
+            self.uneven.append(self.cell)
+        self.end = hi
+        if self.periodStart is None and self.holdStart is not None and hi - self.holdStart + 1 >= self.largest:
+            self.periodStart = self.holdStart
+
+    def append(self, starts, values):
+        needed = self.runs + len(starts)
+        if needed > len(self.starts):
+            size = max(needed, 2 * len(self.starts))
+            self.starts = np.concatenate([self.starts, np.zeros(size - len(self.starts), dtype = np.int64)])
+            self.values = np.concatenate([self.values, np.full(size - len(self.values), np.inf)])
+        self.starts[self.runs:needed] = starts
+        self.values[self.runs:needed] = values
+        self.runs = needed
+        self.sparse = None
+
+    def reduce(self, first, last):
+        """Fold windows [first, last] of counts into the solved counts by taking out bulk parcels
+
+        Returns the folded windows and the number of bulk parcels taken out of each.
+        """
+        bulk = np.maximum(-(-(np.asarray(last) - self.end) // self.bulkLow), 0)
+        return np.maximum(first - bulk * self.bulkHigh, 0), last - bulk * self.bulkLow, bulk
+
+    def range_min(self, first, last):
+        """Return the cheapest cost over each window [first, last] of solved counts"""
+        starts, values = self.solved()
+        if self.sparse is None:
+            levels = [values]
+            while 2 ** len(levels) <= self.runs:
+                half = 2 ** (len(levels) - 1)
+                levels.append(np.minimum(levels[-1][:-half], levels[-1][half:]))
+            self.sparse = [np.concatenate([level, np.full(self.runs - len(level), np.inf)]) for level in levels]
+            self.sparse = np.vstack(self.sparse)
+        begin, stop = self.run_of(first), self.run_of(last)
+        level = np.log2(stop - begin + 1).astype(np.int64)
+        return np.minimum(self.sparse[level, begin], self.sparse[level, stop - 2 ** level + 1])
+
+    def cheapest(self, first, last):
+        """Return the cheapest split of any count from first to last as (cost, count, parcel sizes)"""
+        self.extend(last)
+        folded, foldedLast, bulk = (int(value) for value in self.reduce(first, last))
+        starts, values = self.solved()
+        begin, stop = int(self.runOf[folded + 1]), int(self.runOf[foldedLast + 1])
+        run = begin + int(np.argmin(values[begin:stop + 1]))
+        rest = max(int(starts[run]), folded)
+        count = max(first, rest + bulk * self.bulkLow)
+        return float(values[run]) + bulk * self.bulkCost, count, bulk_sizes(count - rest, bulk) + self.unwind(rest)
+
+    def unwind(self, count):
+        """Return the parcel sizes of the cheapest split of a solved count"""
+        starts, values = self.solved()
+        sizes = []
+        while count > 0:
+            usable = int(np.searchsorted(self.lows, count, side = 'right'))
+            first = np.maximum(count - self.highs[:usable], 0)
+            begin, stop = self.run_of(first), self.run_of(count - self.lows[:usable])
+            lowest, where = values[begin], begin.copy()
+            for step in range(1, int((stop - begin).max()) + 1):
+                run = np.minimum(begin + step, stop)
+                better = values[run] < lowest
+                lowest = np.where(better, values[run], lowest)
+                where = np.where(better, run, where)
+            index = int(np.argmin(lowest + self.costs[:usable]))
+            rest = max(int(starts[where[index]]), int(first[index]))
+            sizes.append(count - rest)
+            count = rest
+        return sizes
+
+
+class SplitOptimizer:
+    """Finds the cheapest split of shipments from one origin"""
+
+    def __init__(self, rateTable, country, curve = None):
+        self.country = country
+        self.curve = curve if curve is not None else dhlQuoteCurve.QuoteCurve(rateTable, country)
+        self.splitTables = {}    # item weight in grams -> SplitTable
+
+    def split_table(self, itemGrams):
+        """Return the DP table for items of itemGrams, building it on first use"""
+        table = self.splitTables.get(itemGrams)
+        if table is None:
+            if len(self.splitTables) >= CACHE_SIZE:
+                del self.splitTables[next(iter(self.splitTables))]
+            table = self.splitTables[itemGrams] = SplitTable(self.curve, itemGrams)
+        return table
+
+    def split(self, itemGrams, items, unsplitWeight = None):
+        """Split items weighing itemGrams each into the cheapest parcels"""
+        if unsplitWeight is None:
+            unsplitWeight = items * itemGrams / 1000
+        unsplitCost = self.curve.cost(unsplitWeight)
+        table = self.split_table(itemGrams)
+        if not len(table.highs):
+            return ShipmentSplit(self.country, [self.parcel(items, itemGrams)], unsplitCost)
+        cost, _, sizes = table.cheapest(items, items)
+
+        # One parcel heavier than the curve, with the cheapest split of what is left
+        tailUnits = np.arange(self.curve.maxUnits + 1, int(item_units(items, itemGrams)) + 1)
+        if len(tailUnits):
+            highs = bucket_highs(itemGrams, tailUnits)
+            lows = np.concatenate([[table.cellHighs[self.curve.maxUnits]], highs[:-1]]) + 1
+            keep = (lows <= highs) & (lows <= items)
+            highs, lows, tailUnits = highs[keep], lows[keep], tailUnits[keep]
+            if len(highs):
+                first, last = np.maximum(items - highs, 0), items - lows
+                table.extend(int(last.max()))
+                folded, foldedLast, bulk = table.reduce(first, last)
+                tailCosts = self.curve.quoter.cost(self.curve.quoter.buffer(tailUnits / 2))[:, 0]
+                totals = tailCosts + table.range_min(folded, foldedLast) + bulk * table.bulkCost
+                index = int(np.argmin(totals))
+                if totals[index] < cost:
+                    _, count, sizes = table.cheapest(int(first[index]), int(last[index]))
+                    sizes.append(items - count)
+
+        parcels = sorted((self.parcel(size, itemGrams) for size in sizes), key = lambda parcel: parcel.weight,
+                         reverse = True)
+        return ShipmentSplit(self.country, parcels, unsplitCost)
+
+    def parcel(self, items, itemGrams):
+        weight = items * itemGrams / 1000
+        return Parcel(items, weight, self.curve.cost(weight))
+
+    def split_weight(self, grossKg):
+        """Return the cheapest split of a gross weight in kilograms, in whole grams
+
+        A fraction of a gram is rounded up, so every weight shares one table and the parcels never weigh less than
+        the shipment. Sending it whole at its exact weight is kept when that is no dearer.
+        """
+        grossKg = checked(grossKg, MAX_SPLIT_WEIGHT, 'gross weight')
+        if grossKg <= 0:
+            return ShipmentSplit(self.country, [], 0.0)
+        grams = math.ceil(round(grossKg * 1000, 6))    # rounded first so float noise stays on its gram
+        split = self.split(1, grams, grossKg)
+        if split.unsplitCost <= split.cost:
+            return ShipmentSplit(self.country, [Parcel(grams, grossKg, split.unsplitCost)], split.unsplitCost)
+        return split
+
+    def split_pieces(self, pieceGrams, quantity):
+        """Return the cheapest split of quantity pieces weighing pieceGrams each, never dividing a piece"""
+        pieceGrams = checked(pieceGrams, MAX_SPLIT_WEIGHT * 1000, 'piece weight')
+        quantity = checked(quantity, MAX_SPLIT_PIECES, 'quantity')
+        if pieceGrams <= 0 or quantity < 1:
+            return ShipmentSplit(self.country, [], 0.0)
+        if pieceGrams < MIN_PIECE_GRAMS:
+            raise ValueError('piece weight must be at least {:g} g to split'.format(MIN_PIECE_GRAMS))
+        if pieceGrams * int(quantity) > MAX_SPLIT_WEIGHT * 1000:
+            raise ValueError('shipment must weigh at most {:,} kg to split'.format(MAX_SPLIT_WEIGHT))
+        return self.split(pieceGrams, int(quantity))
+
+
+def optimizer_for(optimizers, rateTable, country):
+    """Return the SplitOptimizer of a country from a {country: optimizer} cache, rebuilding it for a new rate table"""
+    optimizer = optimizers.get(country)
+    if optimizer is None or optimizer.curve.rateTable is not rateTable:
+        dhlQuoteEngine.origin_column(rateTable, country)    # fail on an unknown origin before building anything
+        optimizer = optimizers[country] = SplitOptimizer(rateTable, country)
+    return optimizer
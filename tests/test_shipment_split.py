@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Checks the shipment split optimizer against a plain dynamic program over every gram or piece count
+
+    python -m unittest discover tests
+
+The reference prices each count with quote_weight, so it knows nothing of buckets or runs: the cheapest split of n is
+the cheapest over k of one parcel of k items plus the cheapest split of n - k.
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dhlQuoteEngine
+import dhlShipmentSplit
+
+COUNTRIES = ('China', 'Taiwan', 'Thailand')
+GRAMS = 130000    # bulk weight covered by the gram reference, into the two parcel splits from 124 kg
+SAMPLES = 200    # random counts split through the public API per check
+
+
+def count_prices(rateTable, country, itemGrams, count):
+    """Return the engine quote of one parcel of every count of items from 0 to count, 0 for none"""
+    column = dhlQuoteEngine.country_column(country)
+    return np.array([0.0] + [dhlQuoteEngine.quote_weight(rateTable, float(n * (itemGrams / 1000)), column)
+                             for n in range(1, count + 1)])
+
+
+def reference_splits(prices):
+    """Return the cheapest split of every count given the price of one parcel of each count"""
+    best = np.zeros(len(prices))
+    for n in range(1, len(prices)):
+        best[n] = (best[:n] + prices[n:0:-1]).min()
+    return best
+
+
+class SplitTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rateTable = dhlQuoteEngine.load_rate_table()
+        cls.random = np.random.RandomState(15)
+
+    def check_split(self, split, country, itemGrams, items, expected):
+        column = dhlQuoteEngine.country_column(country)
+        self.assertAlmostEqual(split.cost, expected, places = 6)
+        self.assertEqual(sum(parcel.items for parcel in split.parcels), items)
+        for parcel in split.parcels:
+            self.assertEqual(parcel.weight, parcel.items * itemGrams / 1000)
+            self.assertEqual(parcel.cost, dhlQuoteEngine.quote_weight(self.rateTable, parcel.weight, column))
+
+    def test_grams(self):
+        for country in COUNTRIES:
+            optimizer = dhlShipmentSplit.SplitOptimizer(self.rateTable, country)
+            expected = reference_splits(count_prices(self.rateTable, country, 1, GRAMS))
+            table = optimizer.split_table(1)
+            table.extend(GRAMS)
+            starts, values = table.solved()
+            solved = values[np.searchsorted(starts, np.arange(GRAMS + 1), side = 'right') - 1]
+            np.testing.assert_allclose(solved, expected, rtol = 0, atol = 1e-6, err_msg = country)
+            for grams in self.random.randint(1, GRAMS + 1, SAMPLES).tolist():
+                self.check_split(optimizer.split_weight(grams / 1000), country, 1, grams, expected[grams])
+
+    def test_pieces(self):
+        for itemGrams, count in ((25, 10000), (17, 10000), (123.457, 2000), (333.3, 750), (0.4, 5000), (2000, 125)):
+            for country in COUNTRIES:
+                optimizer = dhlShipmentSplit.SplitOptimizer(self.rateTable, country)
+                expected = reference_splits(count_prices(self.rateTable, country, itemGrams, count))
+                for items in self.random.randint(1, count + 1, SAMPLES).tolist():
+                    self.check_split(optimizer.split_pieces(itemGrams, items), country, itemGrams, items,
+                                     expected[items])
+
+    def test_exact_weights(self):
+        optimizer = dhlShipmentSplit.SplitOptimizer(self.rateTable, 'China')
+        for split, grossKg in ((optimizer.split_pieces(0.4, 1), 0.0004), (optimizer.split_pieces(2000.4, 1), 2.0004),
+                               (optimizer.split_weight(70.0003), 70.0003)):
+            self.assertEqual(split.unsplitCost, dhlQuoteEngine.quote_shipment(self.rateTable, grossKg, 'China'))
+            self.assertLessEqual(split.cost, split.unsplitCost)
+        self.assertAlmostEqual(optimizer.split_pieces(0.4, 1).cost, 42.91, places = 2)
+        self.assertAlmostEqual(optimizer.split_weight(124.03).cost, 721.92, places = 2)
+        for grossKg in (59.9995, 70.4995):    # rounding up to 60 or 70.5 kg stays in or leaves the price level
+            split = optimizer.split_weight(grossKg)
+            self.assertEqual([parcel.weight for parcel in split.parcels], [grossKg])
+            self.assertEqual(split.cost, dhlQuoteEngine.quote_shipment(self.rateTable, grossKg, 'China'))
+        split = optimizer.split_weight(250.0005)
+        self.assertAlmostEqual(sum(parcel.weight for parcel in split.parcels), 250.001, places = 6)
+        self.assertLess(split.cost, split.unsplitCost)
+
+    def test_heavy(self):
+        optimizer = dhlShipmentSplit.SplitOptimizer(self.rateTable, 'China')
+        for grossKg in (1200, 50000):
+            split = optimizer.split_weight(grossKg)
+            self.assertAlmostEqual(sum(parcel.weight for parcel in split.parcels), grossKg, places = 6)
+            self.assertLess(split.cost, split.unsplitCost)
+
+    def test_limits(self):
+        optimizer = dhlShipmentSplit.SplitOptimizer(self.rateTable, 'China')
+        for grossKg in (float('inf'), float('nan'), dhlShipmentSplit.MAX_SPLIT_WEIGHT + 1):
+            self.assertRaises(ValueError, optimizer.split_weight, grossKg)
+        for pieceGrams, quantity in ((float('inf'), 1), (float('nan'), 1), (10, float('nan')), (10, 1e30),
+                                     (10, dhlShipmentSplit.MAX_SPLIT_PIECES + 1), (0.01, 10), (2e5, 10000)):
+            self.assertRaises(ValueError, optimizer.split_pieces, pieceGrams, quantity)
+        self.assertEqual(optimizer.split_pieces(10, 0).parcels, [])
+        self.assertEqual(len(optimizer.split_weight(dhlShipmentSplit.MAX_SPLIT_WEIGHT).parcels), 1043)
+
+
+if __name__ == '__main__':
+    unittest.main()